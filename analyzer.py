@@ -2,9 +2,11 @@
 Module phân tích tài liệu và tạo tóm tắt, tags, đánh giá
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 import re
 from config import Config
+from taxonomy import get_taxonomy
+from normalizer import NormalizedText, TextLike
 
 try:
     from openai import OpenAI
@@ -16,6 +18,9 @@ except ImportError:
 class DocumentAnalyzer:
     """Class để phân tích và tạo thông tin chi tiết về tài liệu"""
     
+    # Phiên bản logic phân tích - tăng khi kết quả thay đổi để bỏ qua kết quả đã ghi nhớ
+    ANALYZER_VERSION = 1
+    
     # Smart tags mẫu
     COMMON_TAGS = [
         'phap_ly', 'dau_thau', 'FS', 'Pre-FS', 'FEED', 'PPP', 'TOD', 
@@ -24,13 +29,52 @@ class DocumentAnalyzer:
         'báo_cáo', 'thuyết_minh', 'kế_hoạch', 'dự_án'
     ]
     
+    # Pattern tìm số hiệu nghị định/quyết định/thông tư
+    REFERENCE_PATTERNS = [
+        (r'nghị\s*định\s*số\s*(\d+[^\s]*)', 'ND'),
+        (r'quyết\s*định\s*số\s*(\d+[^\s]*)', 'QD'),
+        (r'thông\s*tư\s*số\s*(\d+[^\s]*)', 'TT')
+    ]
+    
+    # Một số địa danh và dự án phổ biến
+    COMMON_LOCATIONS = [
+        'Hà Nội', 'TP.HCM', 'TP Hồ Chí Minh', 'Bình Dương', 'Đồng Nai',
+        'Long An', 'Cần Thơ', 'Đà Nẵng', 'Hải Phòng'
+    ]
+    
+    COMMON_PROJECTS = [
+        'Tuyến 1', 'Tuyến 2', 'Tuyến 3', 'Metro Line', 'TOD',
+        'Suối Cây Sao', 'Đường Thống Nhất', 'TOD4'
+    ]
+    
+    PROJECT_PATTERN = r'(dự\s*án|tuyến|metro\s*line)\s+[A-Z0-9\s]+'
+    
+    # Từ khóa nhạy cảm
+    SENSITIVE_KEYWORDS = [
+        'mật', 'bảo mật', 'bí mật', 'nội bộ', 'không công bố',
+        'confidential', 'internal', 'secret'
+    ]
+    
+    # Từ khóa nội bộ/dự thảo
+    INTERNAL_KEYWORDS = ['nội bộ', 'dự thảo']
+    
+    # Từ khóa công khai
+    PUBLIC_KEYWORDS = [
+        'công khai', 'phổ biến', 'thông báo', 'công bố'
+    ]
+    
+    # Khi phân tích theo luồng: số ký tự đầu giữ lại để tạo tóm tắt
+    STREAM_HEAD_CHARS = 50000
+    # Độ dài đuôi giữ lại giữa hai block để không bỏ sót cụm từ vắt qua ranh giới
+    STREAM_OVERLAP_CHARS = 200
+    
     @staticmethod
-    def analyze(content: str, filename: str, classification: Dict, use_openai: bool = False) -> Dict:
+    def analyze(content: TextLike, filename: str, classification: Dict, use_openai: bool = False) -> Dict:
         """
         Phân tích tài liệu và tạo các thông tin chi tiết
         
         Args:
-            content: Nội dung văn bản
+            content: Nội dung văn bản (chuỗi hoặc NormalizedText dùng chung với các bước khác)
             filename: Tên file
             classification: Kết quả phân loại từ classifier
             use_openai: Sử dụng OpenAI cho tóm tắt tốt hơn (mặc định False)
@@ -38,14 +82,17 @@ class DocumentAnalyzer:
         Returns:
             Dict chứa các thông tin phân tích
         """
+        # Chuẩn hóa một lần cho tất cả các bước bên dưới
+        content = NormalizedText.of(content)
+        
         # Tạo tóm tắt điều hành
-        summary = DocumentAnalyzer.create_executive_summary(content, classification, use_openai=use_openai)
+        summary = DocumentAnalyzer.create_executive_summary(content.nfc, classification, use_openai=use_openai)
         
         # Tạo từ khóa và tags
         keywords, tags = DocumentAnalyzer.extract_keywords_and_tags(content, classification)
         
         # Nhận diện dự án và địa danh
-        projects, locations = DocumentAnalyzer.identify_projects_locations(content)
+        projects, locations = DocumentAnalyzer.identify_projects_locations(content.nfc)
         
         # Đánh giá mức độ bảo mật
         security_level = DocumentAnalyzer.assess_security_level(content, filename)
@@ -63,6 +110,123 @@ class DocumentAnalyzer:
             'action_suggestions': action_suggestions
         }
     
+    @staticmethod
+    def analyze_blocks(blocks: Iterable[Tuple[int, str]], filename: str, classification: Dict,
+                       use_openai: bool = False) -> Dict:
+        """
+        Phân tích tài liệu từ luồng block (DocumentReader.iter_blocks)
+        
+        Các bước đếm/tìm từ khóa chạy trên từng block (kèm đuôi block trước);
+        tóm tắt được tạo từ STREAM_HEAD_CHARS ký tự đầu nên bộ nhớ không phụ
+        thuộc kích thước tài liệu.
+        
+        Args:
+            blocks: Các tuple (số trang, đoạn văn bản)
+            filename: Tên file
+            classification: Kết quả phân loại từ classifier
+            use_openai: Sử dụng OpenAI cho tóm tắt (chỉ gửi phần đầu tài liệu)
+            
+        Returns:
+            Dict chứa các thông tin phân tích (giống analyze)
+        """
+        head_parts = []
+        head_length = 0
+        found_tags = set()
+        references = {prefix: [] for _, prefix in DocumentAnalyzer.REFERENCE_PATTERNS}
+        found_projects = set()
+        found_locations = set()
+        project_matches = []
+        found_terms = set()
+        
+        tail = ""
+        for _, text in blocks:
+            text = NormalizedText(text).nfc
+            if head_length < DocumentAnalyzer.STREAM_HEAD_CHARS:
+                head_parts.append(text[:DocumentAnalyzer.STREAM_HEAD_CHARS - head_length])
+                head_length += len(head_parts[-1])
+            
+            window = tail + text
+            window_lower = window.lower()
+            
+            found_tags.update(DocumentAnalyzer._find_tags(window_lower))
+            
+            for pattern, prefix in DocumentAnalyzer.REFERENCE_PATTERNS:
+                DocumentAnalyzer._collect_matches(pattern, window_lower, references[prefix], 2)
+            
+            found_locations.update(DocumentAnalyzer._find_terms(window, DocumentAnalyzer.COMMON_LOCATIONS))
+            found_projects.update(DocumentAnalyzer._find_terms(window, DocumentAnalyzer.COMMON_PROJECTS))
+            DocumentAnalyzer._collect_matches(DocumentAnalyzer.PROJECT_PATTERN, window, project_matches, 3)
+            
+            found_terms.update(DocumentAnalyzer._find_terms(
+                window_lower,
+                DocumentAnalyzer.SENSITIVE_KEYWORDS + DocumentAnalyzer.INTERNAL_KEYWORDS
+                + DocumentAnalyzer.PUBLIC_KEYWORDS
+            ))
+            
+            tail = window[-DocumentAnalyzer.STREAM_OVERLAP_CHARS:]
+        
+        # Các match chạm cuối block được để dành cho block sau; xử lý nốt ở phần đuôi cuối cùng
+        for pattern, prefix in DocumentAnalyzer.REFERENCE_PATTERNS:
+            DocumentAnalyzer._collect_matches(pattern, tail.lower(), references[prefix], 2, final=True)
+        DocumentAnalyzer._collect_matches(DocumentAnalyzer.PROJECT_PATTERN, tail, project_matches, 3, final=True)
+        
+        head = "".join(head_parts).strip()
+        summary = DocumentAnalyzer.create_executive_summary(head, classification, use_openai=use_openai)
+        
+        keywords = list(classification.get('matched_keywords', []))
+        for _, prefix in DocumentAnalyzer.REFERENCE_PATTERNS:
+            keywords.extend(f"{prefix} {match}" for match in references[prefix])
+        keywords = list(dict.fromkeys(keywords))[:10]
+        
+        # Giữ thứ tự như khi phân tích cả văn bản
+        tags = [tag for tag in DocumentAnalyzer.COMMON_TAGS if tag in found_tags]
+        main_group = classification.get('main_group', '')
+        if main_group and main_group not in tags:
+            tags.append(main_group)
+        
+        projects = [proj for proj in DocumentAnalyzer.COMMON_PROJECTS if proj in found_projects]
+        projects = list(dict.fromkeys(projects + project_matches))
+        locations = [loc for loc in DocumentAnalyzer.COMMON_LOCATIONS if loc in found_locations]
+        security_level = DocumentAnalyzer._security_level(found_terms, filename.lower())
+        action_suggestions = DocumentAnalyzer.suggest_actions(classification, keywords)
+        
+        return {
+            'executive_summary': summary,
+            'keywords': keywords,
+            'tags': tags,
+            'projects': projects,
+            'locations': locations,
+            'security_level': security_level,
+            'action_suggestions': action_suggestions
+        }
+    
+    @staticmethod
+    def _collect_matches(pattern: str, window: str, found: List[str], limit: int, final: bool = False):
+        """
+        Thêm các match (group 1) chưa có của pattern trong window vào found, tối đa limit phần tử
+        
+        Match chạm cuối window có thể bị cắt ngang nên chỉ được nhận khi final=True.
+        """
+        for match in re.finditer(pattern, window, re.IGNORECASE):
+            if len(found) >= limit:
+                return
+            if not final and match.end() >= len(window):
+                continue
+            value = match.group(1).strip()
+            if value not in found:
+                found.append(value)
+    
+    @staticmethod
+    def _find_terms(text: str, terms: List[str]) -> List[str]:
+        """Trả về các cụm từ (theo thứ tự danh sách) xuất hiện trong text"""
+        return [term for term in terms if term in text]
+    
+    @staticmethod
+    def _find_tags(content_lower: str) -> List[str]:
+        """Tìm các tags phổ biến xuất hiện trong nội dung (chữ thường)"""
+        return [tag for tag in DocumentAnalyzer.COMMON_TAGS
+                if tag.replace('_', ' ') in content_lower or tag.replace('_', '') in content_lower]
+    
     @staticmethod
     def create_executive_summary_with_openai(content: str, classification: Dict) -> Optional[str]:
         """Tạo tóm tắt điều hành sử dụng OpenAI"""
@@ -79,15 +243,7 @@ class DocumentAnalyzer:
             # Đọc toàn bộ văn bản (không giới hạn)
             full_content = content
             
-            main_group = classification.get('main_group', 'khac')
-            group_names = {
-                'metro': 'Metro/Đường sắt đô thị',
-                'dau_thau': 'Đấu thầu/Khu giáo dục/TOD',
-                'chung_cu': 'Chung cư',
-                'nha_o_xa_hoi': 'Nhà ở xã hội',
-                'khac': 'Khác'
-            }
-            group_name = group_names.get(main_group, 'Khác')
+            group_name = get_taxonomy().group_name(classification.get('main_group'))
             
             response = client.chat.completions.create(
                 model="gpt-4o-mini",
@@ -140,34 +296,24 @@ class DocumentAnalyzer:
             summary_text = summary_text[:400] + "..."
         
         # Thêm thông tin về phân loại
-        main_group = classification.get('main_group', 'khac')
-        group_names = {
-            'metro': 'Metro/Đường sắt đô thị',
-            'dau_thau': 'Đấu thầu/Khu giáo dục/TOD',
-            'chung_cu': 'Chung cư',
-            'nha_o_xa_hoi': 'Nhà ở xã hội',
-            'khac': 'Khác'
-        }
-        group_name = group_names.get(main_group, 'Khác')
+        group_name = get_taxonomy().group_name(classification.get('main_group'))
         
         summary = f"Tài liệu thuộc nhóm: {group_name}. {summary_text}"
         return summary
     
     @staticmethod
-    def extract_keywords_and_tags(content: str, classification: Dict) -> tuple[List[str], List[str]]:
+    def extract_keywords_and_tags(content: TextLike, classification: Dict) -> tuple[List[str], List[str]]:
         """Trích xuất từ khóa và tags"""
-        content_lower = content.lower()
+        content_lower = NormalizedText.of(content).lower
         
         # Từ khóa từ phân loại
-        keywords = classification.get('matched_keywords', [])
+        keywords = list(classification.get('matched_keywords', []))
         
         # Tags dựa trên từ khóa và nội dung
         tags = []
         
         # Kiểm tra các tags phổ biến
-        for tag in DocumentAnalyzer.COMMON_TAGS:
-            if tag.replace('_', ' ') in content_lower or tag.replace('_', '') in content_lower:
-                tags.append(tag)
+        tags.extend(DocumentAnalyzer._find_tags(content_lower))
         
         # Thêm tags từ phân loại
         main_group = classification.get('main_group', '')
@@ -176,11 +322,7 @@ class DocumentAnalyzer:
         
         # Trích xuất các từ khóa quan trọng khác (tên dự án, số nghị định, v.v.)
         # Tìm số nghị định/quyết định
-        pattern_nd = r'nghị\s*định\s*số\s*(\d+[^\s]*)'
-        pattern_qd = r'quyết\s*định\s*số\s*(\d+[^\s]*)'
-        pattern_tt = r'thông\s*tư\s*số\s*(\d+[^\s]*)'
-        
-        for pattern, prefix in [(pattern_nd, 'ND'), (pattern_qd, 'QD'), (pattern_tt, 'TT')]:
+        for pattern, prefix in DocumentAnalyzer.REFERENCE_PATTERNS:
             matches = re.findall(pattern, content_lower, re.IGNORECASE)
             if matches:
                 for match in matches[:2]:  # Lấy tối đa 2
@@ -193,35 +335,17 @@ class DocumentAnalyzer:
         return keywords, tags
     
     @staticmethod
-    def identify_projects_locations(content: str) -> tuple[List[str], List[str]]:
+    def identify_projects_locations(content: TextLike) -> tuple[List[str], List[str]]:
         """Nhận diện dự án và địa danh"""
+        content = NormalizedText.of(content).nfc
         projects = []
         locations = []
         
-        # Một số địa danh và dự án phổ biến
-        common_locations = [
-            'Hà Nội', 'TP.HCM', 'TP Hồ Chí Minh', 'Bình Dương', 'Đồng Nai',
-            'Long An', 'Cần Thơ', 'Đà Nẵng', 'Hải Phòng'
-        ]
-        
-        common_projects = [
-            'Tuyến 1', 'Tuyến 2', 'Tuyến 3', 'Metro Line', 'TOD',
-            'Suối Cây Sao', 'Đường Thống Nhất', 'TOD4'
-        ]
-        
-        content_normalized = content
-        
-        for loc in common_locations:
-            if loc in content:
-                locations.append(loc)
-        
-        for proj in common_projects:
-            if proj in content:
-                projects.append(proj)
+        locations.extend(DocumentAnalyzer._find_terms(content, DocumentAnalyzer.COMMON_LOCATIONS))
+        projects.extend(DocumentAnalyzer._find_terms(content, DocumentAnalyzer.COMMON_PROJECTS))
         
         # Tìm các dự án có format "Dự án..." hoặc "Tuyến..."
-        pattern_project = r'(dự\s*án|tuyến|metro\s*line)\s+[A-Z0-9\s]+'
-        project_matches = re.findall(pattern_project, content, re.IGNORECASE)
+        project_matches = re.findall(DocumentAnalyzer.PROJECT_PATTERN, content, re.IGNORECASE)
         projects.extend([p.strip() for p in project_matches[:3]])
         
         # Loại bỏ trùng lặp
@@ -231,32 +355,29 @@ class DocumentAnalyzer:
         return projects, locations
     
     @staticmethod
-    def assess_security_level(content: str, filename: str) -> str:
+    def assess_security_level(content: TextLike, filename: str) -> str:
         """Đánh giá mức độ bảo mật"""
-        content_lower = content.lower()
-        filename_lower = filename.lower()
-        
-        # Từ khóa nhạy cảm
-        sensitive_keywords = [
-            'mật', 'bảo mật', 'bí mật', 'nội bộ', 'không công bố',
-            'confidential', 'internal', 'secret'
-        ]
-        
-        # Từ khóa công khai
-        public_keywords = [
-            'công khai', 'phổ biến', 'thông báo', 'công bố'
-        ]
-        
-        for keyword in sensitive_keywords:
-            if keyword in content_lower or keyword in filename_lower:
+        content_lower = NormalizedText.of(content).lower
+        found_terms = set(DocumentAnalyzer._find_terms(
+            content_lower,
+            DocumentAnalyzer.SENSITIVE_KEYWORDS + DocumentAnalyzer.INTERNAL_KEYWORDS
+            + DocumentAnalyzer.PUBLIC_KEYWORDS
+        ))
+        return DocumentAnalyzer._security_level(found_terms, filename.lower())
+    
+    @staticmethod
+    def _security_level(found_terms: set, filename_lower: str) -> str:
+        """Xác định mức độ bảo mật từ tập cụm từ đã tìm thấy trong nội dung"""
+        for keyword in DocumentAnalyzer.SENSITIVE_KEYWORDS:
+            if keyword in found_terms or keyword in filename_lower:
                 return 'nhay_cam'
         
         # Kiểm tra nếu có "nội bộ" hoặc "dự thảo"
-        if 'nội bộ' in content_lower or 'dự thảo' in content_lower:
+        if any(keyword in found_terms for keyword in DocumentAnalyzer.INTERNAL_KEYWORDS):
             return 'noi_bo'
         
-        for keyword in public_keywords:
-            if keyword in content_lower:
+        for keyword in DocumentAnalyzer.PUBLIC_KEYWORDS:
+            if keyword in found_terms:
                 return 'cong_khai'
         
         # Mặc định: nội bộ nếu không có dấu hiệu gì
@@ -4,15 +4,22 @@ Streamlit App - Hệ thống phân loại và quản lý tài liệu
 
 import streamlit as st
 import os
+import time
 import shutil
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from document_reader import DocumentReader
 from classifier import DocumentClassifier
+from taxonomy import get_taxonomy
 from analyzer import DocumentAnalyzer
 from qa_system import QASystem
-from config import Config
+from config import (
+    Config, PREVIEW_MAX_PAGES, PREVIEW_MAX_CHARS, PREVIEW_TIMEOUT, PREVIEW_REFRESH_INTERVAL
+)
 from database import DocumentDB
-from metadata_extractor import MetadataExtractor
+from statistical_classifier import StatisticalClassifier
+from extraction_sandbox import ExtractionSandbox
+from pipeline import DocumentPipeline
 
 
 # Cấu hình trang
@@ -26,12 +33,24 @@ st.set_page_config(
 # Khởi tạo các class
 def init_components():
     db = DocumentDB()
+    # Mô hình thống kê: đọc bản đã lưu rồi học thêm các tài liệu mới trong database
+    statistical = StatisticalClassifier.load()
+    if statistical.train_from_db(db):
+        statistical.save()
     return {
         'reader': DocumentReader(),
+        'sandbox': ExtractionSandbox(),
+        # Bản xem trước: chỉ vài trang / vài chục nghìn ký tự đầu, giới hạn thời gian ngắn
+        'preview_sandbox': ExtractionSandbox(timeout=PREVIEW_TIMEOUT, max_pages=PREVIEW_MAX_PAGES,
+                                             max_chars=PREVIEW_MAX_CHARS),
+        'executor': ThreadPoolExecutor(max_workers=2),
         'classifier': DocumentClassifier(),
+        'statistical': statistical,
         'analyzer': DocumentAnalyzer(),
         'qa': QASystem(db=db),
-        'db': db
+        'db': db,
+        # Ghi nhớ kết quả từng bước theo nội dung: rerun không tính lại bước có đầu vào không đổi
+        'pipeline': DocumentPipeline(db=db, statistical=statistical)
     }
 
 # Khởi tạo components
@@ -55,13 +74,8 @@ with st.sidebar:
     st.markdown("### Thống kê")
     
     # Đếm số file trong mỗi thư mục
-    folders = {
-        'Metro/Đường sắt đô thị': 'Metro_DuongSatDoThi',
-        'Đấu thầu/Khu giáo dục/TOD': 'DauThau_KhuGiaoDuc_TOD',
-        'Chung cư': 'ChungCu',
-        'Nhà ở xã hội': 'NhaO_XaHoi',
-        'Khác': 'Khac'
-    }
+    taxonomy = get_taxonomy()
+    folders = {taxonomy.folder_name(folder): folder for folder in taxonomy.folders()}
     
     # Lấy thống kê từ database
     try:
@@ -144,14 +158,8 @@ if page == "📤 Upload & Phân loại":
     )
     
     if uploaded_file is not None:
-        # Lưu file tạm
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        temp_path = os.path.join(upload_dir, uploaded_file.name)
-        
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Đọc trực tiếp từ buffer upload (không ghi file tạm)
+        file_buffer = uploaded_file.getbuffer()
         
         # Hiển thị thông tin file
         col1, col2, col3 = st.columns(3)
@@ -166,43 +174,89 @@ if page == "📤 Upload & Phân loại":
         st.markdown("---")
         
         # Xử lý file
+        extraction_pending = False
         with st.spinner("Đang đọc và phân tích tài liệu..."):
             try:
-                # Đọc nội dung
-                content, file_type = components['reader'].read_file(temp_path)
+                # Trích xuất toàn bộ chạy nền trong process con có giới hạn thời gian/bộ nhớ/số trang.
+                # Kết quả được giữ trong session để rerun không chạy lại file lỗi.
+                content_hash = components['reader'].file_hash(file_buffer)
+                extraction_jobs = st.session_state.setdefault('extraction_jobs', {})
+                extraction_reports = st.session_state.setdefault('extraction_reports', {})
+                extraction_previews = st.session_state.setdefault('extraction_previews', {})
+                # Mỗi kết quả chứa văn bản: chỉ giữ kết quả của file đang mở
+                for results in (extraction_reports, extraction_previews):
+                    for other_hash in [h for h in results if h != content_hash]:
+                        del results[other_hash]
+                for other_hash in [h for h, job in extraction_jobs.items() if h != content_hash and job.done()]:
+                    del extraction_jobs[other_hash]
+                if content_hash not in extraction_reports and content_hash not in extraction_jobs:
+                    extraction_jobs[content_hash] = components['executor'].submit(
+                        components['sandbox'].extract, file_buffer, uploaded_file.name,
+                        content_hash=content_hash
+                    )
                 
-                # Phân loại
-                classification = components['classifier'].classify(content, uploaded_file.name)
+                job = extraction_jobs.get(content_hash)
+                if job is not None and job.done():
+                    report = job.result()
+                    if report['status'] != 'ok':
+                        components['db'].record_extraction_failure(
+                            filename=uploaded_file.name,
+                            status=report['status'],
+                            error=report['error'],
+                            content_hash=content_hash,
+                            pages_extracted=report['pages']
+                        )
+                    extraction_reports[content_hash] = report
+                    extraction_previews.pop(content_hash, None)
+                    del extraction_jobs[content_hash]
                 
-                # Phân tích (có thể dùng OpenAI nếu có API key)
-                use_openai_analysis = Config.get_api_key() is not None
-                analysis = components['analyzer'].analyze(
-                    content, uploaded_file.name, classification, 
+                # Chưa xong: phân loại và điền metadata trên bản xem trước (vài trang đầu)
+                is_preview = content_hash not in extraction_reports
+                extraction_pending = is_preview
+                if is_preview:
+                    # Bản xem trước cũng được đọc trong sandbox (file hỏng không làm treo app)
+                    # và chỉ đọc một lần cho mỗi file
+                    if content_hash not in extraction_previews:
+                        preview = components['preview_sandbox'].extract(file_buffer, uploaded_file.name,
+                                                                        content_hash=content_hash)
+                        extraction_previews[content_hash] = (preview['text'], preview['file_type'])
+                    content, file_type = extraction_previews[content_hash]
+                    st.info(
+                        "⏳ Đang trích xuất toàn bộ tài liệu. Kết quả bên dưới dựa trên "
+                        f"{PREVIEW_MAX_PAGES} trang đầu và sẽ tự cập nhật khi trích xuất xong."
+                    )
+                else:
+                    extraction_report = extraction_reports[content_hash]
+                    content, file_type = extraction_report['text'], extraction_report['file_type']
+                    
+                    if extraction_report['status'] != 'ok':
+                        st.warning(
+                            f"⚠️ Trích xuất chưa hoàn tất ({extraction_report['error']}). "
+                            f"Đang dùng nội dung của {extraction_report['pages']} trang đầu."
+                        )
+                
+                # Chuẩn hóa, phân loại, trích xuất metadata và phân tích qua pipeline dùng chung
+                # (tài liệu nhiều trang: phân loại trên mẫu trang, dừng sớm khi đã rõ nhóm;
+                # OpenAI chỉ dùng khi có API key và đã có toàn bộ nội dung)
+                pipeline = components['pipeline']
+                use_openai_analysis = Config.get_api_key() is not None and not is_preview
+                processed = pipeline.process(
+                    content, uploaded_file.name,
+                    page_offsets=None if is_preview else extraction_report['page_offsets'],
                     use_openai=use_openai_analysis
                 )
-                
-                # Trích xuất metadata tự động
-                auto_metadata = MetadataExtractor.extract_metadata(content, uploaded_file.name)
+                classification = processed['classification']
+                analysis = processed['analysis']
+                auto_metadata = processed['metadata']
                 
                 # Hiển thị kết quả
-                st.success("✅ Đã xử lý xong!")
-                
-                # Mapping nhóm (dùng chung cho cả app)
-                folder_to_display = {
-                    'Metro_DuongSatDoThi': '🔹 Metro/Đường sắt đô thị',
-                    'DauThau_KhuGiaoDuc_TOD': '🔹 Đấu thầu/Khu giáo dục/TOD',
-                    'ChungCu': '🔹 Chung cư',
-                    'NhaO_XaHoi': '🔹 Nhà ở xã hội',
-                    'Khac': '🔹 Khác'
-                }
+                if not is_preview:
+                    st.success("✅ Đã xử lý xong!")
                 
-                display_to_folder = {
-                    '🔹 Metro/Đường sắt đô thị': 'Metro_DuongSatDoThi',
-                    '🔹 Đấu thầu/Khu giáo dục/TOD': 'DauThau_KhuGiaoDuc_TOD',
-                    '🔹 Chung cư': 'ChungCu',
-                    '🔹 Nhà ở xã hội': 'NhaO_XaHoi',
-                    '🔹 Khác': 'Khac'
-                }
+                # Mapping nhóm (theo bộ phân loại hiện tại)
+                folder_to_display = {folder: f"🔹 {taxonomy.folder_name(folder)}"
+                                     for folder in taxonomy.folders()}
+                display_to_folder = {display: folder for folder, display in folder_to_display.items()}
                 
                 # Tab kết quả
                 tab1, tab2, tab3 = st.tabs(["📊 Kết quả Phân loại", "📝 Phân tích Chi tiết", "📄 Nội dung"])
@@ -226,6 +280,19 @@ if page == "📤 Upload & Phân loại":
                             'thap': '🔴 Thấp'
                         }
                         st.metric("Độ tin cậy", confidence_labels.get(classification['confidence'], classification['confidence']))
+                        
+                        sampling = classification.get('sampling')
+                        if sampling and sampling['early_stop']:
+                            st.caption(f"Phân loại trên {sampling['pages_sampled']}/{sampling['pages_total']} trang mẫu")
+                        
+                        # Gợi ý của mô hình học từ các tài liệu đã lưu (gồm cả các lần chọn nhóm thủ công)
+                        if classification.get('statistical'):
+                            statistical_folder = classification['statistical']['main_folder']
+                            statistical_probability = classification['statistical']['probabilities'][statistical_folder]
+                            st.caption(
+                                f"Mô hình học từ tài liệu đã lưu: {taxonomy.folder_name(statistical_folder)} "
+                                f"({statistical_probability:.0%})"
+                            )
                     
                     with col2:
                         if classification.get('sub_groups'):
@@ -333,9 +400,6 @@ if page == "📤 Upload & Phân loại":
                 st.markdown("---")
                 st.markdown("### 📋 Thông tin Văn bản")
                 
-                # Trích xuất metadata tự động
-                auto_metadata = MetadataExtractor.extract_metadata(content, uploaded_file.name)
-                
                 col1, col2 = st.columns(2)
                 
                 with col1:
@@ -374,10 +438,28 @@ if page == "📤 Upload & Phân loại":
                         placeholder="Ví dụ: Chính phủ, Bộ Xây dựng, ...",
                         help="Tên cơ quan ban hành văn bản"
                     )
+                    
+                    # Số hiệu văn bản
+                    document_number = st.text_input(
+                        "Số hiệu văn bản",
+                        value=auto_metadata['document_number'] if auto_metadata['document_number'] else "",
+                        placeholder="Ví dụ: 123/2024/NĐ-CP",
+                        help="Số hiệu dùng để tra cứu và phát hiện văn bản đã có trong kho"
+                    )
                 
-                if auto_metadata['document_type'] or auto_metadata['issuing_agency'] or auto_metadata['issue_date']:
+                if any(auto_metadata.values()):
                     st.info("ℹ️ Hệ thống đã tự động điền một số thông tin từ tài liệu. Bạn có thể chỉnh sửa nếu cần.")
                 
+                # Văn bản cùng số hiệu đã có trong kho (tra index, không quét nội dung)
+                if document_number.strip():
+                    existing_documents = components['db'].get_documents_by_number(document_number)
+                    if existing_documents:
+                        existing_list = ", ".join(
+                            f"{doc['filename']} (ID: {doc['id']}, {taxonomy.folder_name(doc['category'])})"
+                            for doc in existing_documents
+                        )
+                        st.warning(f"⚠️ Văn bản số {document_number.strip()} đã có trong kho: {existing_list}")
+                
                 # Nút lưu file
                 st.markdown("---")
                 col1, col2, col3 = st.columns([1, 1, 2])
@@ -391,34 +473,38 @@ if page == "📤 Upload & Phân loại":
                     document_type_final = document_type if document_type else None
                     issuing_agency_final = issuing_agency.strip() if issuing_agency.strip() else None
                     issue_date_final = issue_date.strip() if issue_date.strip() else None
+                    document_number_final = document_number.strip() if document_number.strip() else None
                     
-                    if st.button("✅ Lưu vào nhóm", type="primary", use_container_width=True):
+                    # Chỉ lưu khi đã trích xuất xong toàn bộ tài liệu
+                    if st.button("✅ Lưu vào nhóm", type="primary", use_container_width=True,
+                                 disabled=is_preview):
                         # Lưu vào database
                         try:
-                            # Đọc file data
-                            with open(temp_path, "rb") as f:
-                                file_data = f.read()
+                            # Ngày ban hành được lưu ở dạng YYYY-MM-DD (báo lỗi nếu không hợp lệ)
+                            issue_date_final = DocumentDB.parse_issue_date(issue_date_final)
                             
                             # Lưu vào database với metadata đã điền
-                            doc_id = components['db'].save_document(
+                            doc_id = pipeline.persist(
                                 filename=uploaded_file.name,
-                                file_data=file_data,
+                                file_data=file_buffer,
                                 file_type=file_type,
                                 category=final_target_dir,
+                                content=processed['normalized'],
+                                classification=classification,
+                                analysis=analysis,
+                                page_offsets=extraction_report['page_offsets'],
                                 document_type=document_type_final,
                                 issuing_agency=issuing_agency_final,
                                 issue_date=issue_date_final,
-                                content_text=content,
-                                classification_result=classification,
-                                analysis_result=analysis
+                                document_number=document_number_final
                             )
                             
-                            # Xóa file tạm
-                            if os.path.exists(temp_path):
-                                os.remove(temp_path)
-                            
                             st.success(f"✅ Đã lưu vào database: {final_target_display} (ID: {doc_id})")
                             
+                            # Học ngay tài liệu vừa lưu với nhóm cuối cùng (kể cả khi người dùng đổi nhóm)
+                            if components['statistical'].train_from_db(components['db']):
+                                components['statistical'].save()
+                            
                             # Xóa selected_folder khỏi session state sau khi lưu
                             if 'selected_folder' in st.session_state:
                                 del st.session_state.selected_folder
@@ -428,46 +514,54 @@ if page == "📤 Upload & Phân loại":
                 
                 with col2:
                     if st.button("❌ Hủy", use_container_width=True):
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
                         st.rerun()
             
             except Exception as e:
+                # Không tự chạy lại: lần chạy sau sẽ gặp lại đúng lỗi này
+                extraction_pending = False
                 st.error(f"❌ Lỗi: {str(e)}")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+        
+        # Trích xuất toàn bộ chưa xong: chạy lại trang sau một khoảng ngắn để cập nhật kết quả
+        if extraction_pending:
+            time.sleep(PREVIEW_REFRESH_INTERVAL)
+            st.rerun()
 
 elif page == "📁 Quản lý Tài liệu":
     st.title("📁 Quản lý Tài liệu")
     st.markdown("---")
     
     # Chọn nhóm để xem
+    group_folder_mapping = {"Tất cả": None}
+    group_folder_mapping.update(folders)
     selected_group_name = st.selectbox(
         "Chọn nhóm tài liệu",
-        [
-            "Tất cả",
-            "Metro/Đường sắt đô thị",
-            "Đấu thầu/Khu giáo dục/TOD",
-            "Chung cư",
-            "Nhà ở xã hội",
-            "Khác"
-        ]
+        list(group_folder_mapping)
     )
     
-    group_folder_mapping = {
-        "Tất cả": None,
-        "Metro/Đường sắt đô thị": "Metro_DuongSatDoThi",
-        "Đấu thầu/Khu giáo dục/TOD": "DauThau_KhuGiaoDuc_TOD",
-        "Chung cư": "ChungCu",
-        "Nhà ở xã hội": "NhaO_XaHoi",
-        "Khác": "Khac"
-    }
-    
     selected_folder = group_folder_mapping[selected_group_name]
     
+    # Tra cứu theo số hiệu văn bản
+    number_query = st.text_input("Tra cứu theo số hiệu văn bản", placeholder="Ví dụ: 123/2024/NĐ-CP")
+    
+    # Lọc theo khoảng ngày ban hành
+    filter_by_date = st.checkbox("Lọc theo ngày ban hành")
+    if filter_by_date:
+        col1, col2 = st.columns(2)
+        today = datetime.now().date()
+        with col1:
+            date_from = st.date_input("Từ ngày", value=today.replace(month=1, day=1), format="DD/MM/YYYY")
+        with col2:
+            date_to = st.date_input("Đến ngày", value=today, format="DD/MM/YYYY")
+    
     # Lấy danh sách từ database
     try:
-        if selected_folder:
+        if number_query.strip():
+            documents = components['db'].get_documents_by_number(number_query)
+            if selected_folder:
+                documents = [doc for doc in documents if doc['category'] == selected_folder]
+        elif filter_by_date:
+            documents = components['db'].get_documents_by_date_range(date_from, date_to, selected_folder)
+        elif selected_folder:
             documents = components['db'].get_documents_by_category(selected_folder)
         else:
             documents = components['db'].get_all_documents()
@@ -490,6 +584,8 @@ elif page == "📁 Quản lý Tài liệu":
                     
                     # Hiển thị metadata nếu có
                     metadata_info = []
+                    if doc.get('document_number'):
+                        metadata_info.append(f"🔢 {doc['document_number']}")
                     if doc.get('document_type'):
                         metadata_info.append(f"📄 {doc['document_type']}")
                     if doc.get('issuing_agency'):
@@ -536,6 +632,10 @@ elif page == "📁 Quản lý Tài liệu":
                             st.rerun()
                         else:
                             st.error("Lỗi khi xóa file")
+        elif number_query.strip():
+            st.info("🔍 Không tìm thấy văn bản có số hiệu này")
+        elif filter_by_date:
+            st.info("🔍 Không có văn bản nào ban hành trong khoảng ngày này")
         else:
             st.info("📂 Nhóm này chưa có tài liệu nào")
     except Exception as e:
@@ -0,0 +1,169 @@
+"""
+Điền metadata (loại văn bản, cơ quan ban hành, ngày ban hành, số hiệu) cho các tài liệu đã lưu còn thiếu
+
+Tài liệu được lưu trước khi có các cột metadata (hoặc lưu khi không trích
+xuất được) có giá trị NULL. Job đọc dần phần đầu content_text theo id, trích
+xuất metadata trong process pool rồi ghi lại từng trang bằng một lệnh
+executemany, chỉ điền vào các cột đang NULL. Tiến độ được ghi cùng transaction
+với dữ liệu nên có thể dừng (Ctrl+C) và chạy lại để tiếp tục.
+
+Ví dụ:
+    python backfill_metadata.py --db documents.db
+    python backfill_metadata.py --workers 4 --batch-size 2000
+    python backfill_metadata.py --restart
+"""
+
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from config import BACKFILL_BATCH_SIZE, BACKFILL_WORKERS
+from database import DocumentDB
+from metadata_extractor import MetadataExtractor
+
+
+# Tên job trong bảng job_checkpoints
+JOB_NAME = 'metadata_backfill'
+
+# Số ký tự đầu content_text được đọc: MetadataExtractor chỉ dùng PREVIEW_CHARS ký tự
+# đầu sau khi chuẩn hóa NFC, văn bản dạng tổ hợp (NFD) có thể dài gấp 3 trước khi chuẩn hóa
+HEAD_CHARS = 3 * MetadataExtractor.PREVIEW_CHARS
+
+
+def _extract_batch(documents: List[Tuple[int, str, str]]) -> List[Tuple]:
+    """
+    Trích xuất metadata của một trang tài liệu (chạy trong process con)
+    
+    Args:
+        documents: Các tuple (id, tên file, phần đầu nội dung)
+    
+    Returns:
+        Các tuple (id, document_type, issuing_agency, issue_date, document_number)
+        của những tài liệu trích xuất được ít nhất một trường
+    """
+    updates = []
+    for doc_id, filename, content_head in documents:
+        metadata = MetadataExtractor.extract_metadata(content_head, filename)
+        if any(metadata.values()):
+            updates.append((doc_id, metadata['document_type'], metadata['issuing_agency'],
+                            metadata['issue_date'], metadata['document_number']))
+    return updates
+
+
+def backfill_metadata(db: DocumentDB, batch_size: int = BACKFILL_BATCH_SIZE,
+                      workers: Optional[int] = None, restart: bool = False,
+                      progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Điền metadata còn thiếu cho toàn bộ kho tài liệu, tiếp tục từ tiến độ đã lưu
+    
+    Các trang được đọc trước trong lúc worker trích xuất (tối đa 2 trang mỗi
+    worker), kết quả được ghi theo đúng thứ tự id nên tiến độ đã lưu luôn
+    là id mà mọi tài liệu trước đó đã được xử lý.
+    
+    Args:
+        db: DocumentDB
+        batch_size: Số tài liệu mỗi trang đọc/ghi
+        workers: Số process (None: theo config.BACKFILL_WORKERS, 0: theo số CPU, 1: chạy tuần tự)
+        restart: Bỏ tiến độ đã lưu, chạy lại từ đầu
+        progress: Hàm được gọi sau mỗi trang với thống kê lũy kế: last_id,
+            processed, updated, seconds, docs_per_second
+    
+    Returns:
+        Dict thống kê (giống progress) khi đã xử lý hết
+    """
+    if workers is None:
+        workers = BACKFILL_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    
+    if restart:
+        db.clear_checkpoint(JOB_NAME)
+    checkpoint = db.get_checkpoint(JOB_NAME)
+    stats = {
+        'last_id': checkpoint['last_id'] if checkpoint else 0,
+        'processed': checkpoint['processed'] if checkpoint else 0,
+        'updated': checkpoint['updated'] if checkpoint else 0,
+        'seconds': 0.0,
+        'docs_per_second': 0.0
+    }
+    started = time.perf_counter()
+    processed_before = stats['processed']
+    
+    def pages():
+        """Đọc dần các trang tài liệu còn thiếu metadata sau tiến độ đã lưu"""
+        after_id = stats['last_id']
+        while True:
+            documents = db.get_documents_missing_metadata(after_id, batch_size, HEAD_CHARS)
+            if not documents:
+                return
+            after_id = documents[-1]['id']
+            yield [(document['id'], document['filename'], document['content_head'] or "")
+                   for document in documents]
+    
+    def commit(page: List[Tuple[int, str, str]], updates: List[Tuple]):
+        """Ghi kết quả một trang cùng tiến độ trong một transaction"""
+        stats['last_id'] = page[-1][0]
+        stats['processed'] += len(page)
+        stats['updated'] += len(updates)
+        db.fill_missing_metadata(updates, checkpoint=(JOB_NAME, stats['last_id'], stats['processed'],
+                                                      stats['updated']))
+        stats['seconds'] = time.perf_counter() - started
+        if stats['seconds'] > 0:
+            stats['docs_per_second'] = (stats['processed'] - processed_before) / stats['seconds']
+        if progress is not None:
+            progress(dict(stats))
+    
+    if workers == 1:
+        for page in pages():
+            commit(page, _extract_batch(page))
+        return stats
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        try:
+            for page in pages():
+                pending.append((page, executor.submit(_extract_batch, page)))
+                if len(pending) >= workers * 2:
+                    page, future = pending.popleft()
+                    commit(page, future.result())
+            while pending:
+                page, future = pending.popleft()
+                commit(page, future.result())
+        finally:
+            # Bị dừng giữa chừng: bỏ các trang chưa ghi, lần chạy sau làm lại từ tiến độ đã lưu
+            for _, future in pending:
+                future.cancel()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Điền metadata còn thiếu cho các tài liệu đã lưu")
+    parser.add_argument('--db', default="documents.db", help="File DocumentDB (mặc định: documents.db)")
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE,
+                        help=f"Số tài liệu mỗi trang đọc/ghi (mặc định: {BACKFILL_BATCH_SIZE})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Số process trích xuất (0: theo số CPU, 1: chạy tuần tự)")
+    parser.add_argument('--restart', action='store_true', help="Bỏ tiến độ đã lưu, chạy lại từ đầu")
+    args = parser.parse_args(argv)
+    
+    db = DocumentDB(args.db)
+    
+    def report(stats: Dict):
+        print(f"id <= {stats['last_id']}: đã xử lý {stats['processed']}, đã cập nhật {stats['updated']} "
+              f"({stats['docs_per_second']:.0f} tài liệu/s)", file=sys.stderr)
+    
+    try:
+        stats = backfill_metadata(db, args.batch_size, args.workers, args.restart, progress=report)
+    except KeyboardInterrupt:
+        print("Đã dừng - chạy lại lệnh để tiếp tục từ tiến độ đã lưu", file=sys.stderr)
+        return 130
+    
+    print(f"Hoàn tất: đã xử lý {stats['processed']} tài liệu, cập nhật {stats['updated']} tài liệu")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
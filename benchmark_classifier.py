@@ -0,0 +1,290 @@
+"""
+Đo tốc độ và độ chính xác của DocumentClassifier trên bộ tài liệu có nhãn
+
+Ví dụ:
+    python benchmark_classifier.py --scales 100,1000,10000 --output bench.json
+    python benchmark_classifier.py --corpus ./corpus --scales 500
+    python benchmark_classifier.py --db documents.db --workers 4
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from classifier import DocumentClassifier
+from document_reader import DocumentReader
+from normalizer import NormalizedText
+from taxonomy import Taxonomy, get_taxonomy
+from tokenizer import tokenize
+
+
+# Từ ngữ hành chính dùng làm phần nền cho tài liệu tổng hợp (không chứa từ khóa)
+FILLER_WORDS = (
+    "căn cứ luật quyết định số ngày tháng năm ủy ban nhân dân thành phố về việc phê duyệt "
+    "báo cáo kế hoạch triển khai thực hiện các nội dung theo quy định hiện hành của pháp luật "
+    "sở ban ngành liên quan có trách nhiệm phối hợp kiểm tra đôn đốc tổng hợp kết quả trình "
+    "cấp có thẩm quyền xem xét giải quyết kinh phí từ nguồn ngân sách năm điều khoản thi hành "
+    "văn bản này có hiệu lực kể từ ngày ký chánh văn phòng giám đốc thủ trưởng cơ quan đơn vị "
+    "chịu trách nhiệm nơi nhận lưu vt tiến độ hồ sơ tài liệu đề xuất ý kiến thống nhất"
+).split()
+
+
+def generate_corpus(count: int, taxonomy: Taxonomy, doc_chars: int = 5000,
+                    noise: float = 0.2, seed: int = 0) -> List[Tuple[str, str, str]]:
+    """
+    Sinh bộ tài liệu có nhãn từ từ khóa của bộ phân loại
+    
+    Mỗi tài liệu thuộc một thư mục (kể cả "Khác"): phần nền là từ ngữ hành
+    chính, xen các từ khóa của nhóm đó và một tỷ lệ noise từ khóa của nhóm
+    khác. Tài liệu "Khác" chỉ có từ khóa nhiễu.
+    
+    Args:
+        count: Số tài liệu
+        taxonomy: Bộ phân loại lấy từ khóa
+        doc_chars: Độ dài xấp xỉ mỗi tài liệu (ký tự)
+        noise: Tỷ lệ từ khóa lấy từ nhóm khác
+        seed: Hạt giống ngẫu nhiên
+    
+    Returns:
+        List tuple (nội dung, tên file, thư mục đúng)
+    """
+    rng = random.Random(seed)
+    keyword_tokens = {token for key in taxonomy.keyword_keys for token in tokenize(NormalizedText(key).lower)}
+    filler = [word for word in FILLER_WORDS if word not in keyword_tokens]
+    groups = taxonomy.groups + [None]
+    all_keywords = [keyword for group in taxonomy.groups for keyword in taxonomy.keywords[group]]
+    
+    corpus = []
+    for index in range(count):
+        group = groups[index % len(groups)]
+        folder = taxonomy.folder_mapping[group] if group else taxonomy.fallback_folder
+        own_keywords = taxonomy.keywords[group] if group else []
+        
+        words = []
+        length = 0
+        while length < doc_chars:
+            roll = rng.random()
+            if own_keywords and roll < 0.03:
+                word = rng.choice(own_keywords)
+            elif roll < 0.03 + 0.03 * noise:
+                word = rng.choice(all_keywords)
+            else:
+                word = rng.choice(filler)
+            words.append(word)
+            length += len(word) + 1
+        corpus.append((' '.join(words), f"tai_lieu_{index:06d}.txt", folder))
+    return corpus
+
+
+def load_corpus_dir(path: str) -> List[Tuple[str, str, str]]:
+    """
+    Đọc bộ tài liệu từ thư mục: mỗi thư mục con là một nhãn (tên thư mục của nhóm)
+    
+    Returns:
+        List tuple (nội dung, tên file, thư mục đúng)
+    """
+    corpus = []
+    for folder in sorted(os.listdir(path)):
+        folder_path = os.path.join(path, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for name in sorted(os.listdir(folder_path)):
+            try:
+                text, _ = DocumentReader.read_file(os.path.join(folder_path, name))
+            except Exception as e:
+                print(f"Bỏ qua {folder}/{name}: {e}", file=sys.stderr)
+                continue
+            corpus.append((text, name, folder))
+    return corpus
+
+
+def load_corpus_db(db_path: str) -> List[Tuple[str, str, str]]:
+    """
+    Đọc bộ tài liệu từ DocumentDB (nhãn là category người dùng đã chọn khi lưu)
+    
+    Returns:
+        List tuple (nội dung, tên file, thư mục đúng)
+    """
+    from database import DocumentDB
+    
+    db = DocumentDB(db_path)
+    corpus = []
+    last_id = 0
+    while True:
+        documents = db.get_documents_after(last_id, 500)
+        if not documents:
+            return corpus
+        for document in documents:
+            if document['content_text']:
+                corpus.append((document['content_text'], document['filename'], document['category']))
+            last_id = document['id']
+
+
+def scale_corpus(corpus: List[Tuple[str, str, str]], count: int) -> Iterator[Tuple[str, str, str]]:
+    """Lặp lại bộ tài liệu cho đủ count tài liệu"""
+    for index in range(count):
+        yield corpus[index % len(corpus)]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Phân vị (nearest-rank) của danh sách đã sắp xếp"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(len(sorted_values) * fraction))
+    return sorted_values[rank - 1]
+
+
+def confusion_report(pairs: List[Tuple[str, str]], folders: List[str]) -> Dict:
+    """
+    Ma trận nhầm lẫn và precision/recall/F1 theo thư mục
+    
+    Args:
+        pairs: Các cặp (thư mục đúng, thư mục dự đoán)
+        folders: Danh sách thư mục của bộ phân loại
+    
+    Returns:
+        Dict: accuracy, confusion_matrix {đúng: {dự đoán: số tài liệu}}, per_category
+    """
+    labels = list(folders)
+    for expected, predicted in pairs:
+        for label in (expected, predicted):
+            if label not in labels:
+                labels.append(label)
+    
+    matrix = {expected: {predicted: 0 for predicted in labels} for expected in labels}
+    for expected, predicted in pairs:
+        matrix[expected][predicted] += 1
+    
+    per_category = {}
+    for label in labels:
+        true_positive = matrix[label][label]
+        support = sum(matrix[label].values())
+        predicted_total = sum(matrix[other][label] for other in labels)
+        precision = true_positive / predicted_total if predicted_total else 0.0
+        recall = true_positive / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_category[label] = {
+            'support': support,
+            'precision': round(precision, 4),
+            'recall': round(recall, 4),
+            'f1': round(f1, 4)
+        }
+    
+    correct = sum(1 for expected, predicted in pairs if expected == predicted)
+    return {
+        'accuracy': round(correct / len(pairs), 4) if pairs else 0.0,
+        'confusion_matrix': matrix,
+        'per_category': per_category
+    }
+
+
+def run_scale(corpus: List[Tuple[str, str, str]], count: int, taxonomy: Taxonomy,
+              workers: Optional[int]) -> Dict:
+    """
+    Chạy benchmark ở một quy mô
+    
+    Độ trễ từng tài liệu đo khi phân loại tuần tự (không dùng cache phân
+    loại); nếu có workers thì đo thêm thông lượng của classify_many.
+    """
+    documents = list(scale_corpus(corpus, count))
+    total_bytes = sum(len(content.encode('utf-8')) for content, _, _ in documents)
+    
+    latencies = []
+    pairs = []
+    started = time.perf_counter()
+    for content, filename, folder in documents:
+        document_started = time.perf_counter()
+        result = DocumentClassifier.classify(content, filename, taxonomy, use_cache=False)
+        latencies.append(time.perf_counter() - document_started)
+        pairs.append((folder, result['main_folder']))
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    
+    report = {
+        'documents': count,
+        'megabytes': round(total_bytes / 1e6, 3),
+        'seconds': round(seconds, 4),
+        'docs_per_second': round(count / seconds, 2) if seconds else 0.0,
+        'mb_per_second': round(total_bytes / 1e6 / seconds, 3) if seconds else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3) if latencies else 0.0
+        }
+    }
+    
+    if workers is not None and workers != 1:
+        started = time.perf_counter()
+        for _ in DocumentClassifier.classify_many(((content, filename) for content, filename, _ in documents),
+                                                  workers=workers, taxonomy=taxonomy, use_cache=False):
+            pass
+        parallel_seconds = time.perf_counter() - started
+        report['parallel'] = {
+            'workers': workers or os.cpu_count(),
+            'seconds': round(parallel_seconds, 4),
+            'docs_per_second': round(count / parallel_seconds, 2) if parallel_seconds else 0.0,
+            'mb_per_second': round(total_bytes / 1e6 / parallel_seconds, 3) if parallel_seconds else 0.0
+        }
+    
+    report.update(confusion_report(pairs, taxonomy.folders()))
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Đo tốc độ và độ chính xác của DocumentClassifier")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--corpus', help="Thư mục tài liệu có nhãn (mỗi thư mục con là một thư mục nhóm)")
+    source.add_argument('--db', help="Dùng các tài liệu đã lưu trong DocumentDB làm bộ có nhãn")
+    parser.add_argument('--scales', default='100,1000',
+                        help="Các quy mô (số tài liệu), cách nhau bởi dấu phẩy (mặc định: 100,1000)")
+    parser.add_argument('--doc-chars', type=int, default=5000,
+                        help="Độ dài mỗi tài liệu tổng hợp (mặc định: 5000 ký tự)")
+    parser.add_argument('--noise', type=float, default=0.2,
+                        help="Tỷ lệ từ khóa nhiễu của nhóm khác trong tài liệu tổng hợp (mặc định: 0.2)")
+    parser.add_argument('--seed', type=int, default=0, help="Hạt giống sinh tài liệu")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Đo thêm classify_many với số process này (0: theo số CPU)")
+    parser.add_argument('--output', help="File JSON kết quả (mặc định: in ra stdout)")
+    args = parser.parse_args(argv)
+    
+    taxonomy = get_taxonomy()
+    scales = [int(scale) for scale in args.scales.split(',') if scale.strip()]
+    
+    if args.corpus:
+        corpus = load_corpus_dir(args.corpus)
+        corpus_info = {'source': 'directory', 'path': args.corpus, 'documents': len(corpus)}
+    elif args.db:
+        corpus = load_corpus_db(args.db)
+        corpus_info = {'source': 'database', 'path': args.db, 'documents': len(corpus)}
+    else:
+        corpus = generate_corpus(max(scales), taxonomy, args.doc_chars, args.noise, args.seed)
+        corpus_info = {'source': 'synthetic', 'doc_chars': args.doc_chars,
+                       'noise': args.noise, 'seed': args.seed}
+    if not corpus:
+        print("Không có tài liệu nào để đo", file=sys.stderr)
+        return 1
+    
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'taxonomy_version': taxonomy.version,
+        'classifier_version': DocumentClassifier.CLASSIFIER_VERSION,
+        'corpus': corpus_info,
+        'scales': [run_scale(corpus, scale, taxonomy, args.workers) for scale in scales]
+    }
+    
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
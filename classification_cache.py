@@ -0,0 +1,153 @@
+"""
+Module cache kết quả phân loại theo nội dung văn bản và phiên bản bộ phân loại
+"""
+
+import json
+import sqlite3
+import time
+from typing import Dict, Optional
+
+
+class ClassificationCache:
+    """
+    Cache bền vững (SQLite) cho kết quả của DocumentClassifier
+    
+    Khóa gồm SHA-256 của nội dung văn bản, phiên bản phân loại (phiên bản
+    taxonomy kết hợp phiên bản logic phân loại) và các tham số khác ảnh hưởng
+    đến kết quả (tên file, mô hình thống kê, chế độ lấy mẫu). Khi taxonomy.json
+    đổi version, các mục cũ không còn được tra tới và bị xóa dần theo LRU.
+    File database dùng chung giữa các phiên Streamlit và các process.
+    """
+    
+    def __init__(self, db_path: str = "classification_cache.db", max_bytes: int = 64 * 1024 * 1024):
+        """
+        Khởi tạo cache
+        
+        Args:
+            db_path: Đường dẫn đến file database của cache
+            max_bytes: Tổng dung lượng tối đa của các mục trong cache
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.init_database()
+    
+    def get_connection(self):
+        """Tạo connection đến database"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def init_database(self):
+        """Khởi tạo bảng cache nếu chưa tồn tại"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS classification_cache (
+                content_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                params TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (content_hash, version, params)
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_classification_cache_access ON classification_cache(last_access)
+        """)
+        
+        conn.commit()
+        conn.close()
+    
+    def get(self, content_hash: str, version: str, params: str) -> Optional[Dict]:
+        """
+        Lấy kết quả phân loại đã cache
+        
+        Args:
+            content_hash: SHA-256 (hex) của nội dung văn bản
+            version: Phiên bản phân loại
+            params: Các tham số phân loại khác (chuỗi JSON)
+        
+        Returns:
+            Dict kết quả phân loại hoặc None
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT result FROM classification_cache
+            WHERE content_hash = ? AND version = ? AND params = ?
+        """, (content_hash, version, params))
+        row = cursor.fetchone()
+        
+        if row:
+            # Cập nhật thời điểm truy cập cho LRU
+            cursor.execute("""
+                UPDATE classification_cache SET last_access = ?
+                WHERE content_hash = ? AND version = ? AND params = ?
+            """, (time.time(), content_hash, version, params))
+            conn.commit()
+        conn.close()
+        
+        if not row:
+            return None
+        return json.loads(row['result'])
+    
+    def put(self, content_hash: str, version: str, params: str, result: Dict):
+        """
+        Lưu kết quả phân loại vào cache và dọn bớt nếu vượt dung lượng
+        
+        Args:
+            content_hash: SHA-256 (hex) của nội dung văn bản
+            version: Phiên bản phân loại
+            params: Các tham số phân loại khác (chuỗi JSON)
+            result: Dict kết quả phân loại
+        """
+        result_json = json.dumps(result, ensure_ascii=False)
+        size = len(result_json.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT OR REPLACE INTO classification_cache
+            (content_hash, version, params, result, size, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (content_hash, version, params, result_json, size, time.time()))
+        
+        self._evict(cursor)
+        conn.commit()
+        conn.close()
+    
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        conn = self.get_connection()
+        conn.execute("DELETE FROM classification_cache")
+        conn.commit()
+        conn.close()
+    
+    def _evict(self, cursor):
+        """Xóa các mục ít được dùng gần đây nhất cho đến khi tổng dung lượng <= max_bytes"""
+        cursor.execute("SELECT SUM(size) FROM classification_cache")
+        total_size = cursor.fetchone()[0] or 0
+        if total_size <= self.max_bytes:
+            return
+        
+        cursor.execute("""
+            SELECT content_hash, version, params, size FROM classification_cache
+            ORDER BY last_access ASC
+        """)
+        to_delete = []
+        for row in cursor.fetchall():
+            if total_size <= self.max_bytes:
+                break
+            to_delete.append((row['content_hash'], row['version'], row['params']))
+            total_size -= row['size']
+        
+        cursor.executemany("""
+            DELETE FROM classification_cache WHERE content_hash = ? AND version = ? AND params = ?
+        """, to_delete)
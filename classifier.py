@@ -2,129 +2,571 @@
 Module phân loại tài liệu vào các nhóm theo nội dung
 """
 
-from typing import Dict, Tuple
-import re
+import os
+import json
+import math
+import time
+import random
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from taxonomy import Taxonomy, get_taxonomy
+from normalizer import NormalizedText, TextLike
+from keyword_weights import KeywordWeights
+from paging import page_span
+from classification_cache import ClassificationCache
+from config import (
+    CLASSIFY_WORKERS, CLASSIFY_CHUNK_SIZE, STAT_BLEND_WEIGHT,
+    CLASSIFICATION_CACHE_ENABLED, CLASSIFICATION_CACHE_PATH, CLASSIFICATION_CACHE_MAX_BYTES,
+    SAMPLE_MIN_PAGES, SAMPLE_STRATA, SAMPLE_MIN_SAMPLED, SAMPLE_CONFIDENCE_Z
+)
+
+
+# Bộ phân loại (và mô hình thống kê) của process con, nhận một lần khi khởi tạo worker
+_worker_taxonomy = None
+_worker_statistical = None
+_worker_blend = None
+_worker_weights = None
+_worker_use_cache = True
+
+
+def _init_classify_worker(taxonomy: Taxonomy, statistical, blend: Optional[float],
+                          weights: Optional[KeywordWeights] = None, use_cache: bool = True):
+    """Khởi tạo process con: giữ bộ phân loại (kèm automaton đã dựng) cho tất cả các lô"""
+    global _worker_taxonomy, _worker_statistical, _worker_blend, _worker_weights, _worker_use_cache
+    _worker_taxonomy = taxonomy
+    _worker_statistical = statistical
+    _worker_blend = blend
+    _worker_weights = weights
+    _worker_use_cache = use_cache
+
+
+def _classify_chunk(documents: List[Tuple[TextLike, str]]) -> List[Dict]:
+    """Phân loại một lô (nội dung, tên file) (chạy trong process con)"""
+    return [DocumentClassifier.classify(content, filename, _worker_taxonomy,
+                                        _worker_statistical, _worker_blend, _worker_weights, _worker_use_cache)
+            for content, filename in documents]
 
 
 class DocumentClassifier:
-    """Class để phân loại tài liệu vào các nhóm"""
-    
-    # Từ khóa cho mỗi nhóm
-    KEYWORDS = {
-        'metro': [
-            'metro', 'đường sắt đô thị', 'tuyến metro', 'tuyến đường sắt',
-            'depot', 'nhà ga', 'RAMS', 'FEED', 'Pre-FS', 'FS', 'khảo sát',
-            'thiết kế metro', 'vận hành metro', 'TOD', 'transit-oriented',
-            'hạ tầng giao thông', 'đường ray', 'đoàn tàu', 'tàu điện',
-            'MRT', 'urban rail', 'mass transit'
-        ],
-        'dau_thau': [
-            'đấu thầu', 'mời thầu', 'hồ sơ dự thầu', 'đề xuất kỹ thuật',
-            'đề xuất tài chính', 'nhà thầu', 'đấu thầu rộng rãi',
-            'đàm phán cạnh tranh', 'khu giáo dục', 'đường Thống Nhất',
-            'Suối Cây Sao', 'TOD4', 'quy hoạch', 'đầu tư', 'dự án',
-            'thuyết minh dự án', 'hồ sơ mời thầu', 'PPP', 'BT', 'BOT'
-        ],
-        'chung_cu': [
-            'chung cư', 'căn hộ', 'apartment', 'condominium', 'nhà ở cao tầng',
-            'dự án chung cư', 'bán nhà', 'mua nhà', 'sổ đỏ chung cư',
-            'pháp lý chung cư', 'thiết kế chung cư', 'xây dựng chung cư',
-            'kinh doanh bất động sản', 'bán hàng chung cư'
-        ],
-        'nha_o_xa_hoi': [
-            'nhà ở xã hội', 'NOXH', 'nhà ở công nhân', 'nhà ở cho người thu nhập thấp',
-            'chính sách nhà ở xã hội', 'ưu đãi nhà ở', 'an sinh xã hội',
-            'dự án an sinh', 'nhà ở cho người nghèo', 'social housing'
-        ]
-    }
-    
-    # Mapping từ keyword group sang thư mục
-    FOLDER_MAPPING = {
-        'metro': 'Metro_DuongSatDoThi',
-        'dau_thau': 'DauThau_KhuGiaoDuc_TOD',
-        'chung_cu': 'ChungCu',
-        'nha_o_xa_hoi': 'NhaO_XaHoi'
-    }
+    """
+    Class để phân loại tài liệu vào các nhóm
+    
+    Nhóm, thư mục và từ khóa lấy từ bộ phân loại (taxonomy.json, xem module
+    taxonomy). Mỗi lần phân loại dùng trọn một phiên bản bộ phân loại.
+    """
+    
+    # Phiên bản logic phân loại - tăng khi kết quả phân loại thay đổi để bỏ qua cache cũ
+    CLASSIFIER_VERSION = 4
+    
+    _cache = None
     
     @staticmethod
-    def classify(content: str, filename: str = "") -> Dict:
+    def classify(content: TextLike, filename: str = "", taxonomy: Optional[Taxonomy] = None,
+                 statistical=None, blend: Optional[float] = None,
+                 weights: Optional[KeywordWeights] = None, use_cache: bool = True) -> Dict:
         """
         Phân loại tài liệu dựa trên nội dung
         
+        Điểm của mỗi nhóm là tổng số lần xuất hiện từ khóa nhân trọng số IDF
+        của từ khóa (khi có weights; không có thì mỗi lần xuất hiện tính 1).
+        
+        Kết quả được tra trong cache phân loại (theo SHA-256 nội dung và phiên
+        bản bộ phân loại) trước khi quét.
+        
         Args:
-            content: Nội dung văn bản
+            content: Nội dung văn bản (chuỗi hoặc NormalizedText)
             filename: Tên file (để tham khảo)
+            taxonomy: Bộ phân loại (mặc định là phiên bản hiện tại)
+            statistical: StatisticalClassifier chạy song song với điểm từ khóa (tùy chọn)
+            blend: Tỷ trọng của mô hình thống kê khi chọn nhóm chính, 0-1
+                (mặc định config.STAT_BLEND_WEIGHT; 0: chỉ dùng điểm từ khóa)
+            weights: Trọng số IDF của từ khóa (KeywordWeights.from_db, tùy chọn)
+            use_cache: Dùng cache phân loại (mặc định True)
             
         Returns:
-            Dict chứa thông tin phân loại
+            Dict chứa thông tin phân loại; khi có mô hình thống kê thêm 'statistical'
+            (main_folder, probabilities) và 'blended_scores' nếu blend > 0
+        """
+        taxonomy = taxonomy or get_taxonomy()
+        content = NormalizedText.of(content)
+        blend = STAT_BLEND_WEIGHT if blend is None else blend
+        
+        cache = DocumentClassifier.get_cache() if use_cache else None
+        if cache is not None:
+            cache_key = DocumentClassifier.cache_key(content, taxonomy, statistical, weights,
+                                                      mode='full', filename=filename, blend=blend)
+            cached = cache.get(*cache_key)
+            if cached is not None:
+                return cached
+        
+        keyword_counts = DocumentClassifier._count_keywords([content.lower], taxonomy)
+        
+        probabilities = None
+        if statistical is not None and statistical.is_ready:
+            probabilities = statistical.predict_proba(content)
+        
+        result = DocumentClassifier._build_result(keyword_counts, filename, taxonomy, probabilities, blend, weights)
+        
+        if cache is not None:
+            cache.put(*cache_key, result)
+        return result
+    
+    @staticmethod
+    def classify_sampled(content: TextLike, page_offsets: array, filename: str = "",
+                         taxonomy: Optional[Taxonomy] = None, statistical=None,
+                         blend: Optional[float] = None, weights: Optional[KeywordWeights] = None,
+                         seed: int = 0, use_cache: bool = True) -> Dict:
+        """
+        Phân loại tài liệu lớn trên mẫu trang, dừng sớm khi nhóm chính đã rõ
+        
+        Tài liệu được chia thành SAMPLE_STRATA đoạn trang liên tiếp; mỗi vòng lấy
+        ngẫu nhiên một trang chưa đọc trong mỗi đoạn (trang 1 luôn được đọc).
+        Sau mỗi vòng, nếu đã đọc ít nhất SAMPLE_MIN_SAMPLED trang thì xét chênh
+        lệch điểm theo trang giữa nhóm đứng đầu và nhóm thứ hai: dừng khi cận
+        dưới của chênh lệch trung bình (trung bình - SAMPLE_CONFIDENCE_Z x sai số
+        chuẩn, có hiệu chỉnh tổng thể hữu hạn) lớn hơn 0.
+        Số lần xuất hiện từ khóa được ngoại suy theo tỷ lệ số trang nên điểm và
+        độ tin cậy có cùng thang với classify. Tài liệu dưới SAMPLE_MIN_PAGES
+        trang, hoặc chưa dừng sớm được đến khi đã đọc hết các trang, được quét
+        toàn bộ như classify.
+        
+        Args:
+            content: Nội dung văn bản (chuỗi hoặc NormalizedText)
+            page_offsets: Vị trí ký tự bắt đầu mỗi trang trong content
+                (DocumentReader.read_document, DocumentDB)
+            filename: Tên file (để tham khảo)
+            taxonomy: Bộ phân loại (mặc định là phiên bản hiện tại)
+            statistical: StatisticalClassifier (dự đoán trên các trang đã đọc, xem classify)
+            blend: Tỷ trọng của mô hình thống kê (xem classify)
+            weights: Trọng số IDF của từ khóa (xem classify)
+            seed: Hạt giống chọn trang (cùng seed cho cùng kết quả)
+            use_cache: Dùng cache phân loại (mặc định True)
+        
+        Returns:
+            Dict chứa thông tin phân loại (giống classify) kèm 'sampling':
+            pages_total, pages_sampled, early_stop
         """
-        content_lower = content.lower()
-        filename_lower = filename.lower()
+        taxonomy = taxonomy or get_taxonomy()
+        blend = STAT_BLEND_WEIGHT if blend is None else blend
+        content = NormalizedText.of(content)
+        
+        cache = DocumentClassifier.get_cache() if use_cache else None
+        if cache is not None:
+            cache_key = DocumentClassifier.cache_key(content, taxonomy, statistical, weights, mode='sampled',
+                                                      filename=filename, blend=blend, seed=seed,
+                                                      pages=len(page_offsets))
+            cached = cache.get(*cache_key)
+            if cached is not None:
+                return cached
+        
+        result = DocumentClassifier._classify_sampled(content, page_offsets, filename,
+                                                      taxonomy, statistical, blend, weights, seed)
+        
+        if cache is not None:
+            cache.put(*cache_key, result)
+        return result
+    
+    @staticmethod
+    def _classify_sampled(content: NormalizedText, page_offsets: array, filename: str,
+                          taxonomy: Taxonomy, statistical, blend: float,
+                          weights: Optional[KeywordWeights], seed: int) -> Dict:
+        """Phân loại trên mẫu trang (xem classify_sampled, không qua cache)"""
+        raw = content.raw
+        page_count = len(page_offsets)
+        
+        if page_count < SAMPLE_MIN_PAGES:
+            result = DocumentClassifier.classify(content, filename, taxonomy, statistical, blend,
+                                                 weights, use_cache=False)
+            result['sampling'] = {'pages_total': page_count, 'pages_sampled': page_count, 'early_stop': False}
+            return result
+        
+        # Thứ tự đọc: trang 1, sau đó mỗi vòng một trang ngẫu nhiên của mỗi đoạn
+        rng = random.Random(seed)
+        strata = []
+        for index in range(SAMPLE_STRATA):
+            pages = list(range(max(1, page_count * index // SAMPLE_STRATA),
+                               page_count * (index + 1) // SAMPLE_STRATA))
+            rng.shuffle(pages)
+            strata.append(pages)
+        rounds = [[0]]
+        for position in range(max(len(pages) for pages in strata)):
+            rounds.append([pages[position] for pages in strata if position < len(pages)])
+        
+        matcher = taxonomy.matcher
+        totals = [0] * len(matcher.patterns)
+        sampled_pages = []
+        page_scores = []
+        early_stop = False
+        
+        for page_numbers in rounds:
+            for page in page_numbers:
+                start, end = page_span(page_offsets, page + 1, page + 1, len(raw))
+                # Mỗi trang quét riêng để từ khóa không bị ghép qua hai trang không liền nhau
+                counts = matcher.count(taxonomy.vocabulary.encode(NormalizedText(raw[start:end]).lower))
+                totals = [total + count for total, count in zip(totals, counts)]
+                page_scores.append(DocumentClassifier._group_scores(dict(zip(matcher.patterns, counts)),
+                                                                    taxonomy, weights))
+                sampled_pages.append((start, end))
+            
+            sampled = len(sampled_pages)
+            if SAMPLE_MIN_SAMPLED <= sampled < page_count:
+                group_totals = {group: sum(scores[group] for scores in page_scores) for group in taxonomy.groups}
+                ranked = sorted(group_totals, key=group_totals.get, reverse=True)
+                if len(ranked) < 2 or group_totals[ranked[0]] == 0:
+                    continue
+                # Chênh lệch điểm nhất - nhì trên từng trang đã đọc
+                differences = [scores[ranked[0]] - scores[ranked[1]] for scores in page_scores]
+                mean = sum(differences) / sampled
+                variance = sum((d - mean) ** 2 for d in differences) / (sampled - 1)
+                standard_error = math.sqrt(variance / sampled * (1 - sampled / page_count))
+                if mean - SAMPLE_CONFIDENCE_Z * standard_error > 0:
+                    early_stop = True
+                    break
+        
+        if not early_stop:
+            # Đã đọc hết các trang: quét lại liền mạch để đếm cả từ khóa nằm vắt qua ranh giới
+            # hai trang (quét từng trang riêng không đếm được)
+            result = DocumentClassifier.classify(content, filename, taxonomy, statistical, blend,
+                                                 weights, use_cache=False)
+            result['sampling'] = {'pages_total': page_count, 'pages_sampled': page_count, 'early_stop': False}
+            return result
+        
+        # Ngoại suy số đếm cho toàn bộ tài liệu
+        scale = page_count / len(sampled_pages)
+        keyword_counts = {pattern: round(total * scale) for pattern, total in zip(matcher.patterns, totals)}
+        
+        probabilities = None
+        if statistical is not None and statistical.is_ready:
+            probabilities = statistical.predict_proba("\n".join(raw[start:end] for start, end in sampled_pages))
+        
+        result = DocumentClassifier._build_result(keyword_counts, filename, taxonomy, probabilities, blend, weights)
+        result['sampling'] = {
+            'pages_total': page_count,
+            'pages_sampled': len(sampled_pages),
+            'early_stop': early_stop
+        }
+        return result
+    
+    @staticmethod
+    def _group_scores(keyword_counts: Dict[Tuple[int, ...], int], taxonomy: Taxonomy,
+                      weights: Optional[KeywordWeights] = None) -> Dict[str, float]:
+        """Tổng số lần xuất hiện từ khóa (trong nội dung, nhân trọng số IDF nếu có) của mỗi nhóm"""
+        weight = weights.weight if weights is not None else (lambda keyword: 1)
+        return {group: sum(keyword_counts.get(taxonomy.keyword_keys[keyword], 0) * weight(keyword)
+                           for keyword in keywords)
+                for group, keywords in taxonomy.keywords.items()}
+    
+    @staticmethod
+    def find_keywords(content: TextLike, taxonomy: Optional[Taxonomy] = None) -> List[str]:
+        """
+        Các từ khóa của bộ phân loại xuất hiện trong nội dung
+        
+        Dùng khi lưu tài liệu để cập nhật tần suất tài liệu của từ khóa
+        (DocumentDB.save_document).
+        """
+        taxonomy = taxonomy or get_taxonomy()
+        keyword_counts = DocumentClassifier._count_keywords([NormalizedText.of(content).lower], taxonomy)
+        return [keyword for keyword, key in taxonomy.keyword_keys.items() if keyword_counts.get(key, 0) > 0]
+    
+    @staticmethod
+    def classify_blocks(blocks: Iterable[Tuple[int, str]], filename: str = "",
+                        taxonomy: Optional[Taxonomy] = None,
+                        weights: Optional[KeywordWeights] = None) -> Dict:
+        """
+        Phân loại tài liệu từ luồng block (DocumentReader.iter_blocks)
+        
+        Chỉ giữ một block trong bộ nhớ tại mỗi thời điểm.
+        
+        Args:
+            blocks: Các tuple (số trang, đoạn văn bản)
+            filename: Tên file (để tham khảo)
+            taxonomy: Bộ phân loại (mặc định là phiên bản hiện tại)
+            weights: Trọng số IDF của từ khóa (xem classify)
+            
+        Returns:
+            Dict chứa thông tin phân loại (giống classify)
+        """
+        taxonomy = taxonomy or get_taxonomy()
+        keyword_counts = DocumentClassifier._count_keywords(
+            (NormalizedText(text).lower for _, text in blocks), taxonomy
+        )
+        return DocumentClassifier._build_result(keyword_counts, filename, taxonomy, weights=weights)
+    
+    @staticmethod
+    def classify_many(documents: Iterable[Union[TextLike, Tuple[TextLike, str]]],
+                      workers: Optional[int] = None,
+                      chunksize: int = CLASSIFY_CHUNK_SIZE,
+                      taxonomy: Optional[Taxonomy] = None,
+                      progress: Optional[Callable[[Dict], None]] = None,
+                      statistical=None, blend: Optional[float] = None,
+                      weights: Optional[KeywordWeights] = None,
+                      use_cache: bool = True) -> Iterator[Dict]:
+        """
+        Phân loại hàng loạt tài liệu bằng process pool, trả kết quả theo đúng thứ tự đầu vào
+        
+        Tài liệu được đọc dần từ iterable theo từng lô chunksize; chỉ một số lô
+        giới hạn (2 lô mỗi worker) được gửi đi cùng lúc nên có thể truyền vào
+        generator rất lớn. Bộ phân loại được chốt khi bắt đầu và gửi cho mỗi
+        worker một lần lúc khởi tạo.
+        
+        Args:
+            documents: Nội dung văn bản hoặc tuple (nội dung, tên file)
+            workers: Số process (None: theo config.CLASSIFY_WORKERS, 0: theo số CPU, 1: chạy tuần tự)
+            chunksize: Số tài liệu mỗi lô gửi cho worker
+            taxonomy: Bộ phân loại (mặc định là phiên bản hiện tại)
+            progress: Hàm được gọi sau mỗi lô với thống kê lũy kế: documents,
+                characters, seconds, docs_per_second, chars_per_second
+            statistical: StatisticalClassifier (gửi cho worker cùng bộ phân loại, xem classify)
+            blend: Tỷ trọng của mô hình thống kê (xem classify)
+            weights: Trọng số IDF của từ khóa (gửi cho worker cùng bộ phân loại, xem classify)
+            use_cache: Dùng cache phân loại (mặc định True, dùng chung giữa các worker)
+        
+        Yields:
+            Dict chứa thông tin phân loại (giống classify), theo thứ tự đầu vào
+        """
+        taxonomy = taxonomy or get_taxonomy()
+        if workers is None:
+            workers = CLASSIFY_WORKERS
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        
+        stats = {'documents': 0, 'characters': 0, 'seconds': 0.0,
+                 'docs_per_second': 0.0, 'chars_per_second': 0.0}
+        started = time.perf_counter()
+        
+        def report(chunk: List[Tuple[TextLike, str]]):
+            stats['documents'] += len(chunk)
+            stats['characters'] += sum(len(content) for content, _ in chunk)
+            stats['seconds'] = time.perf_counter() - started
+            if stats['seconds'] > 0:
+                stats['docs_per_second'] = stats['documents'] / stats['seconds']
+                stats['chars_per_second'] = stats['characters'] / stats['seconds']
+            if progress is not None:
+                progress(dict(stats))
+        
+        chunks = DocumentClassifier._chunks(documents, chunksize)
+        
+        if workers == 1:
+            for chunk in chunks:
+                results = [DocumentClassifier.classify(content, filename, taxonomy, statistical, blend,
+                                                       weights, use_cache)
+                           for content, filename in chunk]
+                report(chunk)
+                yield from results
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_classify_worker,
+                                 initargs=(taxonomy, statistical, blend, weights, use_cache)) as executor:
+            pending = deque()
+            try:
+                for chunk in chunks:
+                    pending.append((chunk, executor.submit(_classify_chunk, chunk)))
+                    if len(pending) >= workers * 2:
+                        chunk, future = pending.popleft()
+                        results = future.result()
+                        report(chunk)
+                        yield from results
+                while pending:
+                    chunk, future = pending.popleft()
+                    results = future.result()
+                    report(chunk)
+                    yield from results
+            finally:
+                # Người gọi dừng giữa chừng: bỏ các lô chưa chạy
+                for _, future in pending:
+                    future.cancel()
+    
+    @staticmethod
+    def get_cache() -> Optional[ClassificationCache]:
+        """Lấy cache phân loại dùng chung (None nếu bị tắt trong config)"""
+        if not CLASSIFICATION_CACHE_ENABLED:
+            return None
+        if DocumentClassifier._cache is None:
+            DocumentClassifier._cache = ClassificationCache(CLASSIFICATION_CACHE_PATH, CLASSIFICATION_CACHE_MAX_BYTES)
+        return DocumentClassifier._cache
+    
+    @staticmethod
+    def cache_version(taxonomy: Taxonomy) -> str:
+        """Phiên bản phân loại dùng trong khóa cache: đổi khi taxonomy hoặc logic phân loại thay đổi"""
+        return f"taxonomy={taxonomy.version};classifier={DocumentClassifier.CLASSIFIER_VERSION}"
+    
+    @staticmethod
+    def cache_key(content: NormalizedText, taxonomy: Taxonomy, statistical,
+                  weights: Optional[KeywordWeights], **params) -> Tuple[str, str, str]:
+        """
+        Khóa cache của một lần phân loại: (SHA-256 nội dung, phiên bản, tham số)
+        
+        Mô hình thống kê được nhận diện theo tài liệu cuối cùng nó đã học và
+        trọng số IDF theo phiên bản thống kê từ khóa, nên kết quả cũ tự hết
+        hiệu lực khi mô hình học thêm hoặc kho tài liệu thay đổi.
+        """
+        if statistical is not None and statistical.is_ready:
+            params['model'] = statistical.last_trained_id
+        if weights is not None and weights.is_active:
+            params['idf'] = weights.version
+        return (content.digest, DocumentClassifier.cache_version(taxonomy),
+                json.dumps(params, sort_keys=True, ensure_ascii=False))
+    
+    @staticmethod
+    def _chunks(documents: Iterable[Union[TextLike, Tuple[TextLike, str]]],
+                chunksize: int) -> Iterator[List[Tuple[TextLike, str]]]:
+        """Gom tài liệu thành các lô (nội dung, tên file)"""
+        chunk = []
+        for document in documents:
+            if isinstance(document, (str, NormalizedText)):
+                chunk.append((document, ""))
+            else:
+                chunk.append(tuple(document))
+            if len(chunk) >= chunksize:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    @staticmethod
+    def _count_keywords(texts: Iterable[str], taxonomy: Taxonomy) -> Dict[Tuple[int, ...], int]:
+        """
+        Đếm số lần xuất hiện của mỗi từ khóa trên các đoạn văn bản liên tiếp
+        
+        Văn bản ở dạng NormalizedText.lower (NFC, viết thường); khóa trả về là
+        dãy mã token của từ khóa (Taxonomy.keyword_keys).
+        
+        Văn bản được tách token rồi quét một lần bằng automaton trên mã token,
+        nên từ khóa chỉ khớp trọn từ; trạng thái được giữ qua các đoạn nên cụm
+        từ khóa nằm vắt qua ranh giới vẫn được đếm.
+        """
+        matcher = taxonomy.matcher
+        encode = taxonomy.vocabulary.encode
+        stream = matcher.stream()
+        for text in texts:
+            stream.feed(encode(text))
+        return dict(zip(matcher.patterns, stream.counts))
+    
+    @staticmethod
+    def _build_result(keyword_counts: Dict[Tuple[int, ...], int], filename: str, taxonomy: Taxonomy,
+                      probabilities: Optional[Dict[str, float]] = None, blend: float = 0.0,
+                      weights: Optional[KeywordWeights] = None) -> Dict:
+        """Tính điểm từng nhóm từ số lần xuất hiện từ khóa (kết hợp mô hình thống kê nếu có) và tạo kết quả phân loại"""
+        filename_keywords = DocumentClassifier._count_keywords([NormalizedText(filename).lower], taxonomy)
+        weight = weights.weight if weights is not None else (lambda keyword: 1)
         
         # Đếm số từ khóa xuất hiện cho mỗi nhóm
         scores = {}
+        # Số lần khớp chưa nhân trọng số: ngưỡng độ tin cậy tính theo số lần khớp, vì trọng số IDF
+        # của một từ khóa hiếm (tới log(N + 1) + 1) đủ vượt ngưỡng chỉ với một lần khớp
+        hit_counts = {}
         matches = {}
         
-        for group, keywords in DocumentClassifier.KEYWORDS.items():
+        for group, keywords in taxonomy.keywords.items():
             score = 0
+            hits = 0
             matched_keywords = []
             
             for keyword in keywords:
-                # Tìm kiếm từ khóa trong nội dung
-                pattern = re.escape(keyword.lower())
-                count = len(re.findall(pattern, content_lower))
+                # Số lần từ khóa xuất hiện trong nội dung
+                count = keyword_counts.get(taxonomy.keyword_keys[keyword], 0)
                 if count > 0:
-                    score += count
+                    score += count * weight(keyword)
+                    hits += count
                     matched_keywords.append(keyword)
             
             # Kiểm tra trong tên file
             for keyword in keywords:
-                if keyword.lower() in filename_lower:
-                    score += 2
+                if filename_keywords.get(taxonomy.keyword_keys[keyword], 0) > 0:
+                    score += 2 * weight(keyword)
+                    hits += 2
                     if keyword not in matched_keywords:
                         matched_keywords.append(keyword)
             
-            scores[group] = score
+            scores[group] = round(score, 2)
+            hit_counts[group] = hits
             matches[group] = matched_keywords
         
+        blended_scores = None
+        if probabilities and blend > 0:
+            blended_scores = DocumentClassifier._blend_scores(scores, probabilities, blend, taxonomy)
+        
         # Xác định nhóm chính (nhóm có điểm cao nhất)
-        if not any(scores.values()):
+        if blended_scores is not None:
+            main_group = max(blended_scores, key=blended_scores.get)
+            main_folder = taxonomy.folder_mapping.get(main_group, taxonomy.fallback_folder)
+            
+            # Độ tin cậy theo điểm kết hợp (0-1) của nhóm chính
+            if blended_scores[main_group] >= 0.7:
+                confidence = 'cao'
+            elif blended_scores[main_group] >= 0.45:
+                confidence = 'trung_binh'
+            else:
+                confidence = 'thap'
+        elif not any(scores.values()):
             # Không tìm thấy từ khóa nào, xếp vào "Khác"
-            main_group = 'khac'
-            main_folder = 'Khac'
+            main_group = taxonomy.fallback_group
+            main_folder = taxonomy.fallback_folder
             confidence = 'thap'
         else:
             main_group = max(scores, key=scores.get)
-            main_folder = DocumentClassifier.FOLDER_MAPPING.get(main_group, 'Khac')
+            main_folder = taxonomy.folder_mapping.get(main_group, taxonomy.fallback_folder)
             
-            # Đánh giá độ tin cậy
-            max_score = scores[main_group]
-            total_score = sum(scores.values())
+            # Đánh giá độ tin cậy: số lần khớp của nhóm chính và tỷ lệ điểm (có trọng số) của nhóm chính
+            main_hits = hit_counts[main_group]
+            share = scores[main_group] / sum(scores.values())
             
-            if max_score >= 5 and max_score / max(total_score, 1) > 0.6:
+            if main_hits >= 5 and share > 0.6:
                 confidence = 'cao'
-            elif max_score >= 2:
+            elif main_hits >= 2:
                 confidence = 'trung_binh'
             else:
                 confidence = 'thap'
         
         # Xác định nhóm phụ (nếu có)
         sub_groups = []
-        sorted_groups = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        for group, score in sorted_groups[1:3]:  # Lấy 2 nhóm tiếp theo
-            if score > 0 and group != main_group:
+        ranking = blended_scores if blended_scores is not None else scores
+        sorted_groups = sorted(ranking.items(), key=lambda x: x[1], reverse=True)
+        for group, rank in sorted_groups[1:3]:  # Lấy 2 nhóm tiếp theo
+            if rank > 0 and group != main_group and group in scores:
                 sub_groups.append({
                     'group': group,
-                    'folder': DocumentClassifier.FOLDER_MAPPING.get(group, ''),
-                    'score': score
+                    'folder': taxonomy.folder_mapping.get(group, ''),
+                    'score': scores[group]
                 })
         
-        return {
+        result = {
             'main_group': main_group,
             'main_folder': main_folder,
             'sub_groups': sub_groups,
             'confidence': confidence,
             'scores': scores,
-            'matched_keywords': matches[main_group] if main_group != 'khac' else []
+            'matched_keywords': matches.get(main_group, [])
         }
+        if probabilities:
+            result['statistical'] = {
+                'main_folder': max(probabilities, key=probabilities.get),
+                'probabilities': probabilities
+            }
+        if blended_scores is not None:
+            result['blended_scores'] = blended_scores
+        return result
+    
+    @staticmethod
+    def _blend_scores(scores: Dict[str, float], probabilities: Dict[str, float], blend: float,
+                      taxonomy: Taxonomy) -> Dict[str, float]:
+        """
+        Kết hợp điểm từ khóa (chuẩn hóa về tổng 1) với xác suất của mô hình thống kê theo nhóm
+        
+        Không có từ khóa nào thì điểm từ khóa dồn cho nhóm "Khác", như khi chỉ dùng từ khóa.
+        """
+        total_score = sum(scores.values())
+        blended = {}
+        for group in list(taxonomy.groups) + [taxonomy.fallback_group]:
+            if group == taxonomy.fallback_group:
+                keyword_share = 0.0 if total_score else 1.0
+                folder = taxonomy.fallback_folder
+            else:
+                keyword_share = scores.get(group, 0) / total_score if total_score else 0.0
+                folder = taxonomy.folder_mapping[group]
+            blended[group] = (1 - blend) * keyword_share + blend * probabilities.get(folder, 0.0)
+        return blended
 
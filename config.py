@@ -13,6 +13,66 @@ load_dotenv()
 CONFIG_FILE = "config.json"
 USE_DATABASE = True  # True: lưu vào database, False: lưu vào filesystem
 
+# Trích xuất PDF song song theo trang
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', '0'))  # 0: theo số CPU, 1: tắt song song
+PDF_PARALLEL_MIN_PAGES = 32  # Chỉ chạy song song khi PDF có từ số trang này trở lên
+TXT_MMAP_THRESHOLD = 64 * 1024 * 1024  # File TXT từ kích thước này được memory-map khi đọc
+DOCX_ENGINE = 'stream'  # 'stream': đọc luồng word/document.xml, 'python-docx': dùng object model python-docx
+
+# Chế độ xem trước khi upload: phân loại/metadata trên phần đầu tài liệu,
+# trích xuất toàn bộ chạy nền và cập nhật kết quả sau
+PREVIEW_MAX_PAGES = 3
+PREVIEW_MAX_CHARS = 20000
+PREVIEW_TIMEOUT = 10  # Giây - bản xem trước được đọc trong sandbox với giới hạn riêng
+PREVIEW_REFRESH_INTERVAL = 2  # Giây - chu kỳ tự chạy lại trang khi trích xuất toàn bộ chưa xong
+
+# Giới hạn cho process trích xuất (extraction_sandbox)
+SANDBOX_TIMEOUT = 120  # Giây
+SANDBOX_MAX_MEMORY_MB = 1024  # RSS tối đa của process con
+SANDBOX_MAX_PAGES = 2000
+SANDBOX_START_METHOD = 'spawn'  # Không fork từ các thread của Streamlit
+
+# Bộ phân loại (nhóm, thư mục, từ khóa); file được nạp lại khi trường version thay đổi
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "taxonomy.json")
+TAXONOMY_RELOAD_INTERVAL = 5  # Giây giữa hai lần kiểm tra file
+
+# Phân loại hàng loạt (DocumentClassifier.classify_many)
+CLASSIFY_WORKERS = int(os.getenv('CLASSIFY_WORKERS', '0'))  # 0: theo số CPU, 1: chạy tuần tự
+CLASSIFY_CHUNK_SIZE = 16  # Số tài liệu mỗi lô gửi cho process con
+
+# Phân loại trên mẫu trang cho tài liệu lớn (DocumentClassifier.classify_sampled)
+SAMPLE_MIN_PAGES = 100  # Tài liệu ít trang hơn được quét toàn bộ
+SAMPLE_STRATA = 8  # Số đoạn trang, mỗi vòng lấy một trang ở mỗi đoạn
+SAMPLE_MIN_SAMPLED = 17  # Số trang tối thiểu trước khi được dừng sớm
+SAMPLE_CONFIDENCE_Z = 3.0  # Số sai số chuẩn của chênh lệch điểm nhất - nhì theo trang khi xét dừng sớm
+
+# Mô hình phân loại thống kê (statistical_classifier), học từ các tài liệu đã lưu
+STAT_MODEL_PATH = "statistical_model.npz"
+STAT_N_FEATURES = 2 ** 18  # Số chiều sau khi băm n-gram
+STAT_NGRAM = 2  # Unigram và bigram
+STAT_ALPHA = 0.1  # Làm trơn Laplace
+STAT_MAX_TOKENS = 50000  # Số từ đầu tài liệu được dùng làm đặc trưng
+STAT_MIN_DOCUMENTS = 10  # Chưa dùng mô hình khi học ít hơn số tài liệu này
+STAT_OVERRIDE_WEIGHT = 3.0  # Trọng số tài liệu được người dùng đổi nhóm
+STAT_BLEND_WEIGHT = 0.0  # Tỷ trọng mô hình khi kết hợp với điểm từ khóa (0: chỉ dùng từ khóa)
+
+# Cache kết quả trích xuất theo SHA-256 nội dung file
+EXTRACTION_CACHE_ENABLED = True
+EXTRACTION_CACHE_PATH = "extraction_cache.db"
+EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Vượt quá thì xóa mục ít dùng nhất (LRU)
+
+# Cache kết quả phân loại theo SHA-256 nội dung văn bản và phiên bản bộ phân loại
+CLASSIFICATION_CACHE_ENABLED = True
+CLASSIFICATION_CACHE_PATH = "classification_cache.db"
+CLASSIFICATION_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Vượt quá thì xóa mục ít dùng nhất (LRU)
+
+# Số kết quả (phân loại, metadata, phân tích) được DocumentPipeline ghi nhớ trong bộ nhớ
+PIPELINE_MEMO_MAX_ENTRIES = 256  # Vượt quá thì bỏ kết quả ít dùng nhất (LRU)
+
+# Job điền metadata cho các tài liệu đã lưu (backfill_metadata.py)
+BACKFILL_BATCH_SIZE = 1000  # Số tài liệu mỗi trang đọc/ghi (một transaction mỗi trang)
+BACKFILL_WORKERS = 0  # Số process trích xuất (0: theo số CPU, 1: chạy tuần tự)
+
 
 class Config:
     """Class quản lý cấu hình và API key"""
@@ -2,16 +2,30 @@
 Module quản lý database để lưu trữ file và metadata
 """
 
+import re
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime
+from typing import Iterable, List, Dict, Optional, Tuple, Union
 import json
+from array import array
+from metadata_extractor import MetadataExtractor
 
 
 class DocumentDB:
     """Class quản lý database cho tài liệu"""
     
+    # Phiên bản dữ liệu (PRAGMA user_version) - các bước chuyển đổi dữ liệu cũ chỉ chạy một lần
+    SCHEMA_VERSION = 2
+    # Phiên bản mà từ đó issue_date được lưu ở dạng ISO đã kiểm tra (dữ liệu cũ hơn cần chuyển đổi)
+    _ISO_DATE_SCHEMA_VERSION = 2
+    
+    # Các định dạng ngày ban hành được chấp nhận: (pattern, thứ tự các phần)
+    ISSUE_DATE_FORMATS = [
+        (re.compile(r'(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})'), ('day', 'month', 'year')),
+        (re.compile(r'(\d{4})[/.-](\d{1,2})[/.-](\d{1,2})'), ('year', 'month', 'day'))
+    ]
+    
     def __init__(self, db_path: str = "documents.db"):
         """
         Khởi tạo database
@@ -45,7 +59,11 @@ class DocumentDB:
                 document_type TEXT,
                 issuing_agency TEXT,
                 issue_date DATE,
+                document_number TEXT,
+                document_number_key TEXT,
                 content_text TEXT,
+                page_offsets BLOB,
+                keywords_indexed INTEGER DEFAULT 0,
                 classification_result TEXT,
                 analysis_result TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -64,6 +82,14 @@ class DocumentDB:
                 cursor.execute("ALTER TABLE documents ADD COLUMN issuing_agency TEXT")
             if 'issue_date' not in columns:
                 cursor.execute("ALTER TABLE documents ADD COLUMN issue_date DATE")
+            if 'page_offsets' not in columns:
+                cursor.execute("ALTER TABLE documents ADD COLUMN page_offsets BLOB")
+            if 'keywords_indexed' not in columns:
+                cursor.execute("ALTER TABLE documents ADD COLUMN keywords_indexed INTEGER DEFAULT 0")
+            if 'document_number' not in columns:
+                cursor.execute("ALTER TABLE documents ADD COLUMN document_number TEXT")
+            if 'document_number_key' not in columns:
+                cursor.execute("ALTER TABLE documents ADD COLUMN document_number_key TEXT")
         except:
             pass  # Bỏ qua nếu có lỗi
         
@@ -76,13 +102,82 @@ class DocumentDB:
             CREATE INDEX IF NOT EXISTS idx_filename ON documents(filename)
         """)
         
+        # Tra cứu theo số hiệu văn bản (dạng chuẩn, xem MetadataExtractor.document_number_key)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_document_number_key ON documents(document_number_key)
+        """)
+        
+        # Lọc theo khoảng ngày ban hành (issue_date luôn ở dạng ISO YYYY-MM-DD nên so sánh chuỗi đúng thứ tự ngày)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_category_issue_date ON documents(category, issue_date)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_issue_date ON documents(issue_date)
+        """)
+        
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] < DocumentDB._ISO_DATE_SCHEMA_VERSION:
+            self._migrate_issue_dates(cursor)
+        cursor.execute(f"PRAGMA user_version = {DocumentDB.SCHEMA_VERSION}")
+        
+        # Bảng extraction_failures: ghi nhận các lần trích xuất bị dừng (timeout, bộ nhớ, ...)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS extraction_failures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL,
+                content_hash TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                pages_extracted INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Tần suất tài liệu của từ khóa (trọng số IDF khi phân loại), cập nhật khi lưu/xóa tài liệu
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS document_keywords (
+                document_id INTEGER NOT NULL,
+                keyword TEXT NOT NULL,
+                PRIMARY KEY (document_id, keyword)
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_df (
+                keyword TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            )
+        """)
+        
+        # Một dòng duy nhất: số tài liệu đã thống kê và phiên bản (tăng sau mỗi thay đổi)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                documents INTEGER NOT NULL,
+                version INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO keyword_stats (id, documents, version) VALUES (1, 0, 0)")
+        
+        # Tiến độ của các job xử lý hàng loạt (id cuối cùng đã xử lý xong), để chạy tiếp khi bị dừng
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS job_checkpoints (
+                job TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                processed INTEGER NOT NULL,
+                updated INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
         conn.commit()
         conn.close()
     
     def save_document(
         self,
         filename: str,
-        file_data: bytes,
+        file_data: Union[bytes, memoryview],
         file_type: str,
         category: str,
         document_type: Optional[str] = None,
@@ -90,26 +185,40 @@ class DocumentDB:
         issue_date: Optional[str] = None,
         content_text: Optional[str] = None,
         classification_result: Optional[Dict] = None,
-        analysis_result: Optional[Dict] = None
+        analysis_result: Optional[Dict] = None,
+        page_offsets: Optional[array] = None,
+        keywords: Optional[Iterable[str]] = None,
+        document_number: Optional[str] = None
     ) -> int:
         """
         Lưu file vào database
         
         Args:
             filename: Tên file
-            file_data: Dữ liệu file (bytes)
+            file_data: Dữ liệu file (bytes hoặc memoryview, lưu trực tiếp không sao chép)
             file_type: Loại file (pdf, docx, txt)
             category: Nhóm phân loại
             document_type: Loại văn bản (thông tư, nghị định, luật, ...)
             issuing_agency: Cơ quan ban hành
-            issue_date: Ngày ban hành (YYYY-MM-DD hoặc YYYY/MM/DD)
+            issue_date: Ngày ban hành (DD/MM/YYYY, DD-MM-YYYY, YYYY-MM-DD hoặc YYYY/MM/DD),
+                lưu ở dạng YYYY-MM-DD
             content_text: Nội dung văn bản đã trích xuất
             classification_result: Kết quả phân loại
             analysis_result: Kết quả phân tích
+            page_offsets: Vị trí ký tự bắt đầu mỗi trang trong content_text (array('I'))
+            keywords: Các từ khóa xuất hiện trong nội dung (DocumentClassifier.find_keywords),
+                dùng để cập nhật tần suất tài liệu của từ khóa; None: không thống kê
+            document_number: Số hiệu văn bản ("123/2024/NĐ-CP")
             
         Returns:
             ID của document vừa lưu
+        
+        Raises:
+            ValueError: issue_date không đúng định dạng hoặc không phải ngày hợp lệ
         """
+        # Kiểm tra ngày ban hành trước khi mở transaction
+        formatted_date = self.parse_issue_date(issue_date)
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -117,29 +226,13 @@ class DocumentDB:
         classification_json = json.dumps(classification_result, ensure_ascii=False) if classification_result else None
         analysis_json = json.dumps(analysis_result, ensure_ascii=False) if analysis_result else None
         
-        # Chuyển đổi issue_date về format chuẩn (YYYY-MM-DD) nếu có
-        formatted_date = None
-        if issue_date:
-            # Thử parse các format khác nhau
-            try:
-                # Format: YYYY-MM-DD hoặc YYYY/MM/DD
-                if '/' in issue_date:
-                    parts = issue_date.split('/')
-                    if len(parts) == 3:
-                        formatted_date = f"{parts[2]}-{parts[1]}-{parts[0]}"  # DD/MM/YYYY -> YYYY-MM-DD
-                    else:
-                        formatted_date = issue_date.replace('/', '-')
-                else:
-                    formatted_date = issue_date
-            except:
-                formatted_date = issue_date
-        
         cursor.execute("""
             INSERT INTO documents 
             (filename, file_type, file_size, file_data, category, document_type, 
-             issuing_agency, issue_date, content_text, 
+             issuing_agency, issue_date, document_number, document_number_key,
+             content_text, page_offsets, keywords_indexed,
              classification_result, analysis_result, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             filename,
             file_type,
@@ -149,7 +242,11 @@ class DocumentDB:
             document_type,
             issuing_agency,
             formatted_date,
+            document_number,
+            MetadataExtractor.document_number_key(document_number),
             content_text,
+            page_offsets.tobytes() if page_offsets is not None else None,
+            1 if keywords is not None else 0,
             classification_json,
             analysis_json,
             datetime.now(),
@@ -157,6 +254,21 @@ class DocumentDB:
         ))
         
         doc_id = cursor.lastrowid
+        
+        # Cập nhật tần suất từ khóa trong cùng transaction
+        if keywords is not None:
+            unique_keywords = [(keyword,) for keyword in dict.fromkeys(keywords)]
+            cursor.executemany("""
+                INSERT INTO document_keywords (document_id, keyword) VALUES (?, ?)
+            """, [(doc_id, keyword) for (keyword,) in unique_keywords])
+            cursor.executemany("""
+                INSERT INTO keyword_df (keyword, df) VALUES (?, 1)
+                ON CONFLICT(keyword) DO UPDATE SET df = df + 1
+            """, unique_keywords)
+            cursor.execute("""
+                UPDATE keyword_stats SET documents = documents + 1, version = version + 1 WHERE id = 1
+            """)
+        
         conn.commit()
         conn.close()
         
@@ -186,6 +298,55 @@ class DocumentDB:
             return self._row_to_dict(row)
         return None
     
+    def get_page_range(self, doc_id: int, first_page: int, last_page: Optional[int] = None) -> Optional[str]:
+        """
+        Lấy nội dung các trang [first_page, last_page] của document
+        
+        Dùng page_offsets để cắt content_text ngay trong SQLite, không phải
+        tải hay trích xuất lại toàn bộ văn bản.
+        
+        Args:
+            doc_id: ID của document
+            first_page: Trang đầu (đánh số từ 1)
+            last_page: Trang cuối (mặc định bằng first_page)
+        
+        Returns:
+            Nội dung các trang hoặc None nếu không có document/bảng vị trí trang
+        """
+        if last_page is None:
+            last_page = first_page
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT page_offsets, length(content_text) FROM documents WHERE id = ?
+        """, (doc_id,))
+        row = cursor.fetchone()
+        
+        if not row or row[0] is None:
+            conn.close()
+            return None
+        
+        page_offsets = array('I')
+        page_offsets.frombytes(row[0])
+        text_length = row[1] or 0
+        if not page_offsets or first_page > len(page_offsets) or last_page < first_page:
+            conn.close()
+            return ""
+        
+        start = page_offsets[max(first_page, 1) - 1]
+        end = page_offsets[last_page] if last_page < len(page_offsets) else text_length
+        
+        # substr của SQLite đếm theo ký tự, bắt đầu từ 1
+        cursor.execute("""
+            SELECT substr(content_text, ?, ?) FROM documents WHERE id = ?
+        """, (start + 1, end - start, doc_id))
+        text = cursor.fetchone()[0]
+        conn.close()
+        
+        return text
+    
     def get_documents_by_category(self, category: str) -> List[Dict]:
         """
         Lấy danh sách documents theo category
@@ -201,7 +362,7 @@ class DocumentDB:
         
         cursor.execute("""
             SELECT id, filename, file_type, file_size, category, document_type, 
-                   issuing_agency, issue_date, created_at
+                   issuing_agency, issue_date, document_number, created_at
             FROM documents 
             WHERE category = ?
             ORDER BY created_at DESC
@@ -224,7 +385,7 @@ class DocumentDB:
         
         cursor.execute("""
             SELECT id, filename, file_type, file_size, category, document_type, 
-                   issuing_agency, issue_date, created_at
+                   issuing_agency, issue_date, document_number, created_at
             FROM documents 
             ORDER BY created_at DESC
         """)
@@ -234,6 +395,216 @@ class DocumentDB:
         
         return [self._row_to_dict(row) for row in rows]
     
+    def get_documents_after(self, after_id: int = 0, limit: int = 100) -> List[Dict]:
+        """
+        Lấy các documents có id lớn hơn after_id (phân trang theo id, dùng cho huấn luyện/xử lý hàng loạt)
+        
+        Args:
+            after_id: Chỉ lấy documents có id > after_id
+            limit: Số documents tối đa
+        
+        Returns:
+            List các dict chứa id, filename, category, content_text, classification_result
+            (theo thứ tự id tăng dần)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, filename, category, content_text, classification_result
+            FROM documents
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (after_id, limit))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [self._row_to_dict(row) for row in rows]
+    
+    def get_documents_by_date_range(self, start: Union[str, date, None] = None,
+                                    end: Union[str, date, None] = None,
+                                    category: Optional[str] = None) -> List[Dict]:
+        """
+        Lấy documents có ngày ban hành trong khoảng [start, end] (tra index, không quét bảng)
+        
+        Args:
+            start: Ngày đầu (bao gồm), None: không giới hạn
+            end: Ngày cuối (bao gồm), None: không giới hạn
+            category: Lọc theo category (optional)
+        
+        Returns:
+            List các dict chứa thông tin documents (theo ngày ban hành tăng dần)
+        
+        Raises:
+            ValueError: start/end không phải ngày hợp lệ
+        """
+        start = self.parse_issue_date(start) or '0000-01-01'
+        end = self.parse_issue_date(end) or '9999-12-31'
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        if category:
+            cursor.execute("""
+                SELECT id, filename, file_type, file_size, category, document_type, 
+                       issuing_agency, issue_date, document_number, created_at
+                FROM documents 
+                WHERE category = ? AND issue_date BETWEEN ? AND ?
+                ORDER BY issue_date
+            """, (category, start, end))
+        else:
+            cursor.execute("""
+                SELECT id, filename, file_type, file_size, category, document_type, 
+                       issuing_agency, issue_date, document_number, created_at
+                FROM documents 
+                WHERE issue_date BETWEEN ? AND ?
+                ORDER BY issue_date
+            """, (start, end))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [self._row_to_dict(row) for row in rows]
+    
+    def get_documents_by_number(self, document_number: str) -> List[Dict]:
+        """
+        Tìm documents theo số hiệu văn bản (tra index, không quét nội dung)
+        
+        Số hiệu được so khớp ở dạng chuẩn nên "123/2024/nđ-cp" hay
+        "123 / 2024 / NĐ-CP" đều tìm được văn bản "123/2024/NĐ-CP".
+        
+        Args:
+            document_number: Số hiệu văn bản
+        
+        Returns:
+            List các dict chứa thông tin documents
+        """
+        key = MetadataExtractor.document_number_key(document_number)
+        if key is None:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, filename, file_type, file_size, category, document_type, 
+                   issuing_agency, issue_date, document_number, created_at
+            FROM documents 
+            WHERE document_number_key = ?
+            ORDER BY created_at DESC
+        """, (key,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [self._row_to_dict(row) for row in rows]
+    
+    def get_documents_missing_metadata(self, after_id: int = 0, limit: int = 1000,
+                                       head_chars: int = 4500) -> List[Dict]:
+        """
+        Lấy các documents còn thiếu metadata (document_type, issuing_agency, issue_date hoặc document_number là NULL)
+        
+        Phân trang theo id (keyset) và chỉ đọc phần đầu content_text, nên quét
+        được cả kho lớn mà không phải tải toàn bộ nội dung.
+        
+        Args:
+            after_id: Chỉ lấy documents có id > after_id
+            limit: Số documents tối đa
+            head_chars: Số ký tự đầu của content_text được đọc
+        
+        Returns:
+            List các dict chứa id, filename, content_head (theo thứ tự id tăng dần)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, filename, substr(content_text, 1, ?) AS content_head
+            FROM documents
+            WHERE id > ?
+              AND content_text IS NOT NULL
+              AND (document_type IS NULL OR issuing_agency IS NULL OR issue_date IS NULL
+                   OR document_number IS NULL)
+            ORDER BY id
+            LIMIT ?
+        """, (head_chars, after_id, limit))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [self._row_to_dict(row) for row in rows]
+    
+    def fill_missing_metadata(self, updates: Iterable[Tuple[int, Optional[str], Optional[str],
+                                                            Optional[str], Optional[str]]],
+                              checkpoint: Optional[Tuple[str, int, int, int]] = None) -> int:
+        """
+        Điền metadata cho nhiều documents trong một transaction, chỉ ghi vào các cột đang NULL
+        
+        Args:
+            updates: Các tuple (id, document_type, issuing_agency, issue_date, document_number) -
+                giá trị None hoặc cột đã có giá trị (kể cả do người dùng nhập) được giữ nguyên;
+                issue_date không phải ngày hợp lệ được bỏ qua
+            checkpoint: Tuple (tên job, last_id, processed, updated) ghi cùng
+                transaction (xem get_checkpoint), để job chạy tiếp đúng chỗ khi bị dừng
+        
+        Returns:
+            Số documents đã được cập nhật
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        now = datetime.now()
+        cursor.executemany("""
+            UPDATE documents SET
+                document_type = COALESCE(document_type, ?),
+                issuing_agency = COALESCE(issuing_agency, ?),
+                issue_date = COALESCE(issue_date, ?),
+                document_number_key = CASE WHEN document_number IS NULL THEN ? ELSE document_number_key END,
+                document_number = COALESCE(document_number, ?),
+                updated_at = ?
+            WHERE id = ?
+        """, [(document_type, issuing_agency, self.parse_issue_date(issue_date, strict=False),
+               MetadataExtractor.document_number_key(document_number), document_number, now, doc_id)
+              for doc_id, document_type, issuing_agency, issue_date, document_number in updates])
+        updated = cursor.rowcount
+        
+        if checkpoint is not None:
+            job, last_id, processed, total_updated = checkpoint
+            cursor.execute("""
+                INSERT OR REPLACE INTO job_checkpoints (job, last_id, processed, updated, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (job, last_id, processed, total_updated, now))
+        
+        conn.commit()
+        conn.close()
+        
+        return updated
+    
+    def get_checkpoint(self, job: str) -> Optional[Dict]:
+        """
+        Lấy tiến độ đã lưu của một job xử lý hàng loạt
+        
+        Returns:
+            Dict chứa job, last_id, processed, updated, updated_at hoặc None
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM job_checkpoints WHERE job = ?", (job,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return dict(row) if row else None
+    
+    def clear_checkpoint(self, job: str):
+        """Xóa tiến độ đã lưu của một job (lần chạy sau bắt đầu lại từ đầu)"""
+        conn = self.get_connection()
+        conn.execute("DELETE FROM job_checkpoints WHERE job = ?", (job,))
+        conn.commit()
+        conn.close()
+    
     def delete_document(self, doc_id: int) -> bool:
         """
         Xóa document khỏi database
@@ -247,11 +618,27 @@ class DocumentDB:
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        cursor.execute("SELECT keywords_indexed FROM documents WHERE id = ?", (doc_id,))
+        row = cursor.fetchone()
+        
         cursor.execute("""
             DELETE FROM documents WHERE id = ?
         """, (doc_id,))
         
         success = cursor.rowcount > 0
+        
+        # Trừ tần suất các từ khóa của document (cùng transaction với lệnh xóa)
+        if success and row['keywords_indexed']:
+            cursor.execute("""
+                UPDATE keyword_df SET df = df - 1
+                WHERE keyword IN (SELECT keyword FROM document_keywords WHERE document_id = ?)
+            """, (doc_id,))
+            cursor.execute("DELETE FROM keyword_df WHERE df <= 0")
+            cursor.execute("DELETE FROM document_keywords WHERE document_id = ?", (doc_id,))
+            cursor.execute("""
+                UPDATE keyword_stats SET documents = documents - 1, version = version + 1 WHERE id = 1
+            """)
+        
         conn.commit()
         conn.close()
         
@@ -274,7 +661,7 @@ class DocumentDB:
         if category:
             cursor.execute("""
                 SELECT id, filename, file_type, file_size, category, document_type, 
-                       issuing_agency, issue_date, created_at
+                       issuing_agency, issue_date, document_number, created_at
                 FROM documents 
                 WHERE (filename LIKE ? OR content_text LIKE ?) AND category = ?
                 ORDER BY created_at DESC
@@ -282,7 +669,7 @@ class DocumentDB:
         else:
             cursor.execute("""
                 SELECT id, filename, file_type, file_size, category, document_type, 
-                       issuing_agency, issue_date, created_at
+                       issuing_agency, issue_date, document_number, created_at
                 FROM documents 
                 WHERE filename LIKE ? OR content_text LIKE ?
                 ORDER BY created_at DESC
@@ -293,6 +680,66 @@ class DocumentDB:
         
         return [self._row_to_dict(row) for row in rows]
     
+    def record_extraction_failure(
+        self,
+        filename: str,
+        status: str,
+        error: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        pages_extracted: Optional[int] = None
+    ) -> int:
+        """
+        Ghi nhận một lần trích xuất không hoàn tất
+        
+        Args:
+            filename: Tên file
+            status: Trạng thái (timeout, memory, page_limit, error)
+            error: Mô tả lỗi
+            content_hash: SHA-256 nội dung file
+            pages_extracted: Số trang đã trích xuất được
+        
+        Returns:
+            ID của bản ghi
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT INTO extraction_failures 
+            (filename, content_hash, status, error, pages_extracted, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (filename, content_hash, status, error, pages_extracted, datetime.now()))
+        
+        failure_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        
+        return failure_id
+    
+    def get_extraction_failures(self, limit: int = 100) -> List[Dict]:
+        """
+        Lấy các lần trích xuất không hoàn tất gần nhất
+        
+        Args:
+            limit: Số bản ghi tối đa
+        
+        Returns:
+            List các dict chứa thông tin lỗi
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT * FROM extraction_failures
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (limit,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [self._row_to_dict(row) for row in rows]
+    
     def get_statistics(self) -> Dict:
         """
         Lấy thống kê về documents
@@ -328,7 +775,91 @@ class DocumentDB:
             'total_size': total_size
         }
     
+    def get_keyword_frequencies(self) -> Dict:
+        """
+        Lấy thống kê tần suất tài liệu của từ khóa (xem KeywordWeights)
+        
+        Returns:
+            Dict chứa documents (số tài liệu đã thống kê), version và
+            frequencies ({từ khóa: số tài liệu chứa từ khóa})
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT documents, version FROM keyword_stats WHERE id = 1")
+        stats = cursor.fetchone()
+        
+        cursor.execute("SELECT keyword, df FROM keyword_df")
+        frequencies = {row['keyword']: row['df'] for row in cursor.fetchall()}
+        
+        conn.close()
+        
+        return {
+            'documents': stats['documents'],
+            'version': stats['version'],
+            'frequencies': frequencies
+        }
+    
+    @staticmethod
+    def parse_issue_date(issue_date: Union[str, date, None], strict: bool = True) -> Optional[str]:
+        """
+        Chuyển ngày ban hành về dạng chuẩn YYYY-MM-DD
+        
+        Args:
+            issue_date: Ngày dạng DD/MM/YYYY, DD-MM-YYYY, DD.MM.YYYY, YYYY-MM-DD,
+                YYYY/MM/DD hoặc date
+            strict: True: báo lỗi nếu không hợp lệ; False: trả None
+        
+        Returns:
+            Ngày dạng YYYY-MM-DD hoặc None nếu rỗng
+        
+        Raises:
+            ValueError: Không đúng định dạng hoặc không phải ngày hợp lệ (khi strict)
+        """
+        if isinstance(issue_date, date):
+            return issue_date.strftime('%Y-%m-%d')
+        if not issue_date or not issue_date.strip():
+            return None
+        
+        for pattern, order in DocumentDB.ISSUE_DATE_FORMATS:
+            match = pattern.fullmatch(issue_date.strip())
+            if match:
+                parts = dict(zip(order, map(int, match.groups())))
+                try:
+                    return date(parts['year'], parts['month'], parts['day']).strftime('%Y-%m-%d')
+                except ValueError:
+                    break
+        
+        if strict:
+            raise ValueError(f"Ngày ban hành không hợp lệ: {issue_date} (định dạng DD/MM/YYYY)")
+        return None
+    
+    @staticmethod
+    def _migrate_issue_dates(cursor):
+        """
+        Chuyển issue_date của các documents cũ về dạng YYYY-MM-DD
+        
+        Trước đây ngày được lưu gần như nguyên văn (DD-MM-YYYY, YYYY/MM/DD bị
+        đảo thành DD-MM-YYYY, ...). Mọi giá trị đều được kiểm tra lại, kể cả
+        giá trị có dạng ISO nhưng không phải ngày có thật (2024-02-30,
+        2024-13-05), vì truy vấn theo khoảng ngày dựa vào việc cột chỉ chứa
+        ngày hợp lệ. Giá trị không đọc được thành NULL để job
+        backfill_metadata điền lại từ nội dung.
+        """
+        cursor.execute("SELECT id, issue_date FROM documents WHERE issue_date IS NOT NULL")
+        updates = []
+        for row in cursor.fetchall():
+            issue_date = DocumentDB.parse_issue_date(str(row[1]), strict=False)
+            if issue_date != row[1]:
+                updates.append((issue_date, row[0]))
+        cursor.executemany("UPDATE documents SET issue_date = ? WHERE id = ?", updates)
+    
     def _row_to_dict(self, row) -> Dict:
         """Chuyển row thành dict"""
-        return dict(row)
+        result = dict(row)
+        if result.get('page_offsets') is not None:
+            page_offsets = array('I')
+            page_offsets.frombytes(result['page_offsets'])
+            result['page_offsets'] = page_offsets
+        return result
 
@@ -3,72 +3,761 @@ Module đọc và xử lý các file tài liệu (PDF, DOCX, TXT)
 """
 
 import os
-from typing import Optional
-import PyPDF2
-from docx import Document
+import io
+import mmap
+import codecs
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import closing, contextmanager
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from config import (
+    PDF_WORKERS, PDF_PARALLEL_MIN_PAGES, TXT_MMAP_THRESHOLD, DOCX_ENGINE,
+    EXTRACTION_CACHE_ENABLED, EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_MAX_BYTES
+)
+from extraction_cache import ExtractionCache
+import paging
+
+
+# Nguồn tài liệu: đường dẫn file, buffer trong bộ nhớ hoặc file-like (chế độ nhị phân)
+DocumentSource = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+# Namespace XML của WordprocessingML
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+# PdfReader của process con, tạo một lần khi khởi tạo worker
+_worker_pdf_reader = None
+
+
+def _init_pdf_worker(source: Union[str, bytes]):
+    """Khởi tạo process con: mở PDF một lần cho tất cả các dải trang"""
+    global _worker_pdf_reader
+    import PyPDF2
+    stream = open(source, 'rb') if isinstance(source, str) else io.BytesIO(source)
+    _worker_pdf_reader = PyPDF2.PdfReader(stream)
+
+
+def _extract_pdf_page_range(start: int, end: int) -> List[str]:
+    """Trích xuất text các trang [start, end) của PDF (chạy trong process con)"""
+    return [(_worker_pdf_reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+class _BufferReader(io.RawIOBase):
+    """File-like chỉ đọc trên bytearray/memoryview, không sao chép toàn bộ buffer"""
+    
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, b) -> int:
+        size = min(len(b), len(self._view) - self._position)
+        if size <= 0:
+            return 0
+        b[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(offset, 0)
+        return self._position
+    
+    def tell(self) -> int:
+        return self._position
+
+
+class _BorrowedStream:
+    """Bọc file-like của người gọi: dùng được trong khối with nhưng không đóng file gốc"""
+    
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def close(self):
+        pass
 
 
 class DocumentReader:
     """Class để đọc nội dung từ các file PDF, DOCX, TXT"""
     
+    # Kích thước tối đa (ký tự) của một block khi đọc theo luồng
+    BLOCK_SIZE = 64 * 1024
+    
+    # Encoding thử cho file TXT (theo thứ tự ưu tiên; latin-1 luôn giải mã được)
+    TXT_ENCODINGS = ['utf-8', 'cp1258', 'latin-1']
+    # Số byte đầu file dùng để đoán encoding
+    TXT_SAMPLE_BYTES = 64 * 1024
+    # Kích thước chunk khi giải mã TXT
+    TXT_CHUNK_BYTES = 4 * 1024 * 1024
+    
+    # Phiên bản logic trích xuất - tăng khi kết quả trích xuất thay đổi để bỏ qua cache cũ
+    READER_VERSION = 4
+    # Số byte đầu file dùng để nhận diện định dạng (header PDF có thể nằm trong 1024 byte đầu)
+    SNIFF_BYTES = 1024
+    
+    _cache = None
+    # Các engine đọc theo định dạng (xem register_reader), theo thứ tự nhận diện
+    _readers: Dict[str, Dict] = {}
+    
     @staticmethod
-    def read_file(file_path: str) -> tuple[str, str]:
+    def read_file(source: DocumentSource, filename: Optional[str] = None,
+                  use_cache: bool = True) -> tuple[str, str]:
         """
         Đọc nội dung từ file
         
         Args:
-            file_path: Đường dẫn đến file
+            source: Đường dẫn đến file, hoặc nội dung file dạng bytes/memoryview/file-like
+                (được parse trực tiếp trong bộ nhớ, không ghi ra file tạm)
+            filename: Tên file để xác định định dạng (bắt buộc nếu source không phải đường dẫn)
+            use_cache: Dùng cache trích xuất (mặc định True)
             
         Returns:
             tuple: (nội dung văn bản, loại file)
         """
-        file_ext = os.path.splitext(file_path)[1].lower()
+        text, file_type, _ = DocumentReader.read_document(source, filename, use_cache)
+        return text, file_type
+    
+    @staticmethod
+    def read_document(source: DocumentSource, filename: Optional[str] = None,
+                      use_cache: bool = True) -> Tuple[str, str, array]:
+        """
+        Đọc nội dung từ file kèm bảng vị trí trang
+        
+        Kết quả được tra trong cache trích xuất (theo SHA-256 nội dung file)
+        trước khi parse.
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file (xem read_file)
+            filename: Tên file để xác định định dạng
+            use_cache: Dùng cache trích xuất (mặc định True)
+        
+        Returns:
+            tuple: (nội dung văn bản, loại file, page_offsets) - page_offsets[i] là
+            vị trí ký tự bắt đầu trang i + 1 trong nội dung (array('I'))
+        """
+        cache = DocumentReader.get_cache() if use_cache else None
+        if cache is not None:
+            content_hash = DocumentReader.file_hash(source)
+            cached = cache.get(content_hash, DocumentReader.READER_VERSION)
+            if cached:
+                return cached['text'], cached['file_type'], cached['page_offsets']
+        
+        text, file_type, page_offsets = DocumentReader._extract(source, filename)
+        
+        if cache is not None:
+            cache.put(content_hash, DocumentReader.READER_VERSION, text, file_type, page_offsets)
+        
+        return text, file_type, page_offsets
+    
+    @staticmethod
+    def page_of(page_offsets: array, position: int) -> int:
+        """Số trang (bắt đầu từ 1) chứa ký tự ở vị trí position"""
+        return paging.page_of(page_offsets, position)
+    
+    @staticmethod
+    def page_range(text: str, page_offsets: array, first_page: int, last_page: Optional[int] = None) -> str:
+        """
+        Lấy nội dung các trang [first_page, last_page] (đánh số từ 1) mà không cần trích xuất lại
+        
+        Args:
+            text: Nội dung văn bản
+            page_offsets: Bảng vị trí trang của nội dung
+            first_page: Trang đầu
+            last_page: Trang cuối (mặc định bằng first_page)
+        """
+        start, end = DocumentReader.page_span(page_offsets, first_page, last_page, len(text))
+        return text[start:end]
+    
+    @staticmethod
+    def page_span(page_offsets: array, first_page: int, last_page: Optional[int], text_length: int) -> Tuple[int, int]:
+        """Khoảng ký tự [start, end) của các trang [first_page, last_page]"""
+        return paging.page_span(page_offsets, first_page, last_page, text_length)
+    
+    @staticmethod
+    def get_cache() -> Optional[ExtractionCache]:
+        """Lấy cache trích xuất dùng chung (None nếu bị tắt trong config)"""
+        if not EXTRACTION_CACHE_ENABLED:
+            return None
+        if DocumentReader._cache is None:
+            DocumentReader._cache = ExtractionCache(EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_MAX_BYTES)
+        return DocumentReader._cache
+    
+    @staticmethod
+    def file_hash(source: DocumentSource) -> str:
+        """Tính SHA-256 (hex) của nội dung file (buffer được hash trực tiếp, file đọc theo chunk)"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(source).hexdigest()
+        
+        sha256 = hashlib.sha256()
+        with DocumentReader._open_source(source) as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+    
+    @staticmethod
+    def _open_source(source: DocumentSource) -> BinaryIO:
+        """
+        Mở nguồn tài liệu thành file-like nhị phân, đặt ở đầu file
+        
+        bytes dùng BytesIO (chia sẻ buffer, không sao chép); bytearray/memoryview
+        đọc trực tiếp trên buffer. File-like của người gọi không bị đóng khi
+        ra khỏi khối with.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            return open(source, 'rb')
+        if isinstance(source, bytes):
+            return io.BytesIO(source)
+        if isinstance(source, (bytearray, memoryview)):
+            return io.BufferedReader(_BufferReader(source))
+        
+        source.seek(0)
+        return _BorrowedStream(source)
+    
+    @staticmethod
+    def _get_extension(source: DocumentSource, filename: Optional[str]) -> str:
+        """Lấy phần mở rộng (chữ thường) từ filename hoặc đường dẫn ('' nếu không có tên)"""
+        name = filename
+        if name is None and isinstance(source, (str, os.PathLike)):
+            name = os.fspath(source)
+        if name is None:
+            return ''
+        return os.path.splitext(name)[1].lower()
+    
+    @staticmethod
+    def register_reader(file_type: str, iter_pages: Callable[[DocumentSource], Iterator[Tuple[int, str]]],
+                        extract: Optional[Callable[[DocumentSource], Tuple[str, array]]] = None,
+                        sniff: Optional[Callable[[bytes, BinaryIO], bool]] = None,
+                        extensions: Iterable[str] = ()):
+        """
+        Đăng ký engine đọc cho một định dạng
+        
+        Thư viện của engine nên được import bên trong các hàm đọc để chỉ nạp
+        khi thật sự gặp định dạng đó.
+        
+        Args:
+            file_type: Tên định dạng (ví dụ 'pdf'), cũng là file_type trả về khi đọc
+            iter_pages: Hàm đọc theo luồng, yield (số trang, nội dung) như iter_pages
+            extract: Hàm đọc toàn bộ, trả về (nội dung, page_offsets); mặc định ghép từ iter_pages
+            sniff: Hàm nhận diện theo nội dung, nhận (header, file đặt ở đầu) và trả về True
+                nếu đúng định dạng; None nếu định dạng không có magic bytes (chỉ nhận theo phần mở rộng)
+            extensions: Các phần mở rộng (có dấu chấm) của định dạng
+        """
+        DocumentReader._readers[file_type] = {
+            'iter_pages': iter_pages,
+            'extract': extract,
+            'sniff': sniff,
+            'extensions': tuple(ext.lower() for ext in extensions)
+        }
+    
+    @staticmethod
+    def detect_format(source: DocumentSource, filename: Optional[str] = None) -> str:
+        """
+        Xác định định dạng file
+        
+        Ưu tiên magic bytes nên file bị đặt sai phần mở rộng vẫn được đọc đúng
+        engine. Nếu nội dung không khớp định dạng nào, dùng phần mở rộng cho
+        các định dạng không có magic bytes (TXT).
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file (xem read_file)
+            filename: Tên file (dùng khi không nhận diện được theo nội dung)
+        
+        Returns:
+            str: Tên định dạng đã đăng ký (pdf, docx, txt, ...)
+        """
+        with DocumentReader._open_source(source) as file:
+            header = file.read(DocumentReader.SNIFF_BYTES)
+            for file_type, reader in DocumentReader._readers.items():
+                if reader['sniff'] is None:
+                    continue
+                file.seek(0)
+                try:
+                    if reader['sniff'](header, file):
+                        return file_type
+                except Exception:
+                    continue
         
-        if file_ext == '.pdf':
-            return DocumentReader.read_pdf(file_path), 'pdf'
-        elif file_ext == '.docx':
-            return DocumentReader.read_docx(file_path), 'docx'
-        elif file_ext == '.txt':
-            return DocumentReader.read_txt(file_path), 'txt'
+        file_ext = DocumentReader._get_extension(source, filename)
+        if not file_ext:
+            raise ValueError("Không nhận diện được định dạng, cần truyền filename khi đọc từ bộ nhớ")
+        for file_type, reader in DocumentReader._readers.items():
+            if file_ext in reader['extensions']:
+                if reader['sniff'] is not None:
+                    raise ValueError(f"Nội dung file không đúng định dạng {file_ext}")
+                return file_type
+        raise ValueError(f"Định dạng file không được hỗ trợ: {file_ext}")
+    
+    @staticmethod
+    def _extract(source: DocumentSource, filename: Optional[str] = None) -> Tuple[str, str, array]:
+        """
+        Parse file theo định dạng
+        
+        Returns:
+            tuple: (nội dung văn bản, loại file, vị trí ký tự bắt đầu mỗi trang)
+        """
+        file_type = DocumentReader.detect_format(source, filename)
+        reader = DocumentReader._readers[file_type]
+        
+        if reader['extract'] is not None:
+            text, page_offsets = reader['extract'](source)
         else:
-            raise ValueError(f"Định dạng file không được hỗ trợ: {file_ext}")
+            pages = []
+            current_page = None
+            for page_number, text in reader['iter_pages'](source):
+                if page_number != current_page:
+                    pages.append([])
+                    current_page = page_number
+                pages[-1].append(text)
+            text, page_offsets = DocumentReader._join_pages(["".join(page) for page in pages])
+        return text, file_type, page_offsets or array('I', [0])
+    
+    @staticmethod
+    def _extract_pdf(source: DocumentSource) -> Tuple[str, array]:
+        """Đọc toàn bộ PDF (song song theo trang nếu nhiều trang)"""
+        return DocumentReader._join_pages(DocumentReader.read_pdf_pages(source))
+    
+    @staticmethod
+    def _extract_docx(source: DocumentSource) -> Tuple[str, array]:
+        """Đọc toàn bộ DOCX, gom đoạn văn theo trang (ngắt trang thủ công)"""
+        if DOCX_ENGINE != 'stream':
+            return DocumentReader.read_docx(source), array('I', [0])
+        pages = []
+        current_page = None
+        for page_number, text in DocumentReader.iter_docx_paragraphs(source):
+            if page_number != current_page:
+                pages.append([])
+                current_page = page_number
+            pages[-1].append(text)
+        return DocumentReader._join_pages(["\n".join(page) for page in pages])
     
     @staticmethod
-    def read_pdf(file_path: str) -> str:
-        """Đọc nội dung từ file PDF"""
-        text = ""
+    def _extract_txt(source: DocumentSource) -> Tuple[str, array]:
+        """Đọc toàn bộ TXT, trang được ngăn cách bởi ký tự form feed"""
+        text = DocumentReader.read_txt(source)
+        page_offsets = array('I', [0])
+        position = text.find('\f')
+        while position != -1:
+            page_offsets.append(position + 1)
+            position = text.find('\f', position + 1)
+        return text, page_offsets
+    
+    @staticmethod
+    def _join_pages(pages: List[str]) -> Tuple[str, array]:
+        """Ghép các trang bằng "\n" (một lần) và tính vị trí bắt đầu mỗi trang trong văn bản đã strip"""
+        text = "\n".join(pages)
+        stripped = text.lstrip()
+        shift = len(text) - len(stripped)
+        text = stripped.rstrip()
+        
+        page_offsets = array('I')
+        position = 0
+        for page in pages:
+            page_offsets.append(min(max(position - shift, 0), len(text)))
+            position += len(page) + 1
+        return text, page_offsets
+    
+    @staticmethod
+    def iter_pages(source: DocumentSource, filename: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Đọc tài liệu theo luồng, trả về từng trang kèm số trang
+        
+        PDF trả về đúng một phần cho mỗi trang. TXT được tách trang theo ký tự
+        form feed và một trang dài có thể được trả về thành nhiều phần liên
+        tiếp cùng số trang. DOCX không có khái niệm trang nên coi là trang 1.
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file (xem read_file)
+            filename: Tên file để xác định định dạng
+            
+        Yields:
+            tuple: (số trang bắt đầu từ 1, nội dung)
+        """
+        file_type = DocumentReader.detect_format(source, filename)
+        yield from DocumentReader._readers[file_type]['iter_pages'](source)
+    
+    @staticmethod
+    def _iter_pdf_pages(source: DocumentSource) -> Iterator[Tuple[int, str]]:
+        """Đọc PDF theo luồng, mỗi trang một phần"""
+        import PyPDF2
+        try:
+            with DocumentReader._open_source(source) as file:
+                pdf_reader = PyPDF2.PdfReader(file)
+                for page_number, page in enumerate(pdf_reader.pages, 1):
+                    yield page_number, page.extract_text() or ""
+        except Exception as e:
+            raise Exception(f"Lỗi khi đọc PDF: {str(e)}")
+    
+    @staticmethod
+    def _iter_docx_pages(source: DocumentSource) -> Iterator[Tuple[int, str]]:
+        """Đọc DOCX theo luồng, các đoạn văn cùng trang được nối bằng xuống dòng"""
+        if DOCX_ENGINE != 'stream':
+            yield 1, DocumentReader.read_docx(source)
+            return
+        current_page = None
+        for page_number, text in DocumentReader.iter_docx_paragraphs(source):
+            yield page_number, text if page_number != current_page else "\n" + text
+            current_page = page_number
+    
+    @staticmethod
+    def _sniff_pdf(header: bytes, file: BinaryIO) -> bool:
+        """PDF: file bắt đầu bằng "%PDF-" (bỏ qua BOM và khoảng trắng đầu file)"""
+        # Không tìm "%PDF-" ở bất kỳ đâu: file TXT trích dẫn "%PDF-1.4" gần đầu sẽ bị đọc nhầm thành PDF
+        return header.removeprefix(b'\xef\xbb\xbf').lstrip().startswith(b'%PDF-')
+    
+    @staticmethod
+    def _sniff_docx(header: bytes, file: BinaryIO) -> bool:
+        """DOCX: file ZIP có word/document.xml"""
+        if not header.startswith(b'PK\x03\x04'):
+            return False
+        with zipfile.ZipFile(file) as archive:
+            return 'word/document.xml' in archive.namelist()
+    
+    @staticmethod
+    def iter_blocks(source: DocumentSource, filename: Optional[str] = None,
+                    block_size: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Đọc tài liệu theo luồng thành các block có kích thước giới hạn
+        
+        Block được cắt tại khoảng trắng khi có thể; giữa hai trang có thêm
+        "\n" nên ghép các block lại sẽ được nội dung như read_file (trước khi strip).
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file (xem read_file)
+            filename: Tên file để xác định định dạng
+            block_size: Số ký tự tối đa mỗi block (mặc định BLOCK_SIZE)
+            
+        Yields:
+            tuple: (số trang, đoạn văn bản)
+        """
+        block_size = block_size or DocumentReader.BLOCK_SIZE
+        current_page = None
+        
+        for page_number, text in DocumentReader.iter_pages(source, filename):
+            if current_page is not None and page_number != current_page:
+                yield current_page, "\n"
+            current_page = page_number
+            
+            start = 0
+            while len(text) - start > block_size:
+                end = start + block_size
+                cut = max(text.rfind(' ', start, end), text.rfind('\n', start, end))
+                if cut <= start:
+                    cut = end - 1
+                yield page_number, text[start:cut + 1]
+                start = cut + 1
+            if start < len(text):
+                yield page_number, text[start:] if start else text
+    
+    @staticmethod
+    def read_pdf(source: DocumentSource, workers: Optional[int] = None) -> str:
+        """
+        Đọc nội dung từ file PDF
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file
+            workers: Số process trích xuất (xem read_pdf_pages)
+        """
+        return DocumentReader._join_pages(DocumentReader.read_pdf_pages(source, workers))[0]
+    
+    @staticmethod
+    def read_pdf_pages(source: DocumentSource, workers: Optional[int] = None) -> List[str]:
+        """
+        Đọc nội dung từng trang của file PDF
+        
+        Với PDF nhiều trang, các dải trang được chia cho một process pool và
+        kết quả được trả về theo đúng thứ tự trang.
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file
+            workers: Số process trích xuất (None: theo config.PDF_WORKERS,
+                0: theo số CPU, 1: đọc tuần tự)
+        
+        Returns:
+            List nội dung các trang
+        """
+        if workers is None:
+            workers = PDF_WORKERS
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        
         try:
-            with open(file_path, 'rb') as file:
+            import PyPDF2
+            with DocumentReader._open_source(source) as file:
                 pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+                num_pages = len(pdf_reader.pages)
+                if workers == 1 or num_pages < PDF_PARALLEL_MIN_PAGES:
+                    return [(page.extract_text() or "") for page in pdf_reader.pages]
+                
+                # Process con cần dữ liệu có thể pickle: đường dẫn hoặc bytes (gửi một lần mỗi worker)
+                if isinstance(source, (str, os.PathLike)):
+                    worker_source = os.fspath(source)
+                elif isinstance(source, bytes):
+                    worker_source = source
+                else:
+                    file.seek(0)
+                    worker_source = file.read()
+            
+            # Chia thành nhiều dải trang hơn số worker để cân bằng tải
+            chunk_size = max(1, -(-num_pages // (workers * 4)))
+            ranges = [(start, min(start + chunk_size, num_pages))
+                      for start in range(0, num_pages, chunk_size)]
+            
+            pages = []
+            with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                     initializer=_init_pdf_worker,
+                                     initargs=(worker_source,)) as executor:
+                # executor.map trả kết quả theo thứ tự các dải trang
+                for chunk in executor.map(_extract_pdf_page_range,
+                                          [r[0] for r in ranges],
+                                          [r[1] for r in ranges]):
+                    pages.extend(chunk)
         except Exception as e:
             raise Exception(f"Lỗi khi đọc PDF: {str(e)}")
-        return text.strip()
+        return pages
     
     @staticmethod
-    def read_docx(file_path: str) -> str:
-        """Đọc nội dung từ file DOCX"""
+    def read_docx(source: DocumentSource) -> str:
+        """
+        Đọc nội dung từ file DOCX
+        
+        Mặc định (config.DOCX_ENGINE = 'stream') đọc theo luồng bằng
+        iter_docx_paragraphs, có cả nội dung bảng; 'python-docx' dùng object
+        model của python-docx (chỉ các đoạn văn ngoài bảng).
+        """
+        if DOCX_ENGINE == 'stream':
+            return "\n".join(text for _, text in DocumentReader.iter_docx_paragraphs(source)).strip()
+        
         try:
-            doc = Document(file_path)
+            from docx import Document
+            with DocumentReader._open_source(source) as file:
+                doc = Document(file)
             text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
             return text.strip()
         except Exception as e:
             raise Exception(f"Lỗi khi đọc DOCX: {str(e)}")
     
     @staticmethod
-    def read_txt(file_path: str) -> str:
-        """Đọc nội dung từ file TXT"""
+    def iter_docx_paragraphs(source: DocumentSource) -> Iterator[Tuple[int, str]]:
+        """
+        Đọc DOCX theo luồng từ word/document.xml bằng parser XML tăng dần
+        
+        Không dựng object model của python-docx: phần tử nào xử lý xong được
+        xóa khỏi cây nên bộ nhớ không phụ thuộc kích thước tài liệu. Đoạn văn
+        và các dòng bảng (các ô ngăn cách bởi tab) được trả về theo thứ tự
+        trong tài liệu.
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file
+        
+        Yields:
+            tuple: (số trang tính theo ngắt trang thủ công, nội dung đoạn/dòng bảng)
+        """
         try:
-            # Thử các encoding khác nhau
-            encodings = ['utf-8', 'utf-8-sig', 'cp1258', 'latin-1']
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as file:
-                        return file.read().strip()
-                except UnicodeDecodeError:
-                    continue
+            with DocumentReader._open_source(source) as file, \
+                    zipfile.ZipFile(file) as archive, \
+                    archive.open('word/document.xml') as xml_stream:
+                page_number = 1
+                page_break = False
+                body = None
+                paragraphs = []  # Stack các run text của đoạn đang đọc (textbox có đoạn lồng nhau)
+                rows = []        # Stack các ô của dòng bảng đang đọc (bảng lồng nhau)
+                cells = []       # Stack các đoạn của ô bảng đang đọc
+                fallback_depth = 0
+                
+                for event, elem in ET.iterparse(xml_stream, events=('start', 'end')):
+                    tag = elem.tag
+                    
+                    if event == 'start':
+                        if tag == _W + 'body':
+                            body = elem
+                        elif tag == _MC_FALLBACK:
+                            # Bỏ qua bản dự phòng của textbox/hình để không lặp nội dung
+                            fallback_depth += 1
+                        elif fallback_depth:
+                            continue
+                        elif tag == _W + 'p':
+                            paragraphs.append([])
+                        elif tag == _W + 'tr':
+                            rows.append([])
+                        elif tag == _W + 'tc':
+                            cells.append([])
+                        continue
+                    
+                    if tag == _MC_FALLBACK:
+                        fallback_depth -= 1
+                        elem.clear()
+                        continue
+                    if fallback_depth or not paragraphs and tag not in (_W + 'tc', _W + 'tr', _W + 'tbl'):
+                        continue
+                    
+                    if tag == _W + 't':
+                        paragraphs[-1].append(elem.text or '')
+                    elif tag == _W + 'tab':
+                        paragraphs[-1].append('\t')
+                    elif tag in (_W + 'br', _W + 'cr'):
+                        if elem.get(_W + 'type') == 'page':
+                            page_break = True
+                        else:
+                            paragraphs[-1].append('\n')
+                    elif tag == _W + 'p':
+                        text = ''.join(paragraphs.pop())
+                        if cells:
+                            cells[-1].append(text)
+                        else:
+                            yield page_number, text
+                    elif tag == _W + 'tc':
+                        rows[-1].append(' '.join(text for text in cells.pop() if text))
+                    elif tag == _W + 'tr':
+                        text = '\t'.join(rows.pop())
+                        if cells:
+                            cells[-1].append(text)
+                        else:
+                            yield page_number, text
+                    else:
+                        continue
+                    
+                    if tag in (_W + 'p', _W + 'tr') and not cells and not paragraphs:
+                        # Phần tử cấp cao nhất đã xử lý xong: giải phóng khỏi cây
+                        elem.clear()
+                        if body is not None:
+                            body.clear()
+                        if page_break:
+                            page_number += 1
+                            page_break = False
+        except Exception as e:
+            raise Exception(f"Lỗi khi đọc DOCX: {str(e)}")
+    
+    @staticmethod
+    def read_txt(source: DocumentSource) -> str:
+        """
+        Đọc nội dung từ file TXT
+        
+        Dữ liệu chỉ được đọc một lần: encoding được đoán từ BOM và một mẫu ở đầu
+        file, sau đó giải mã một lượt. File lớn (>= TXT_MMAP_THRESHOLD) được
+        memory-map và giải mã theo chunk.
+        """
+        try:
+            with DocumentReader._open_txt_data(source) as data:
+                encoding = DocumentReader._detect_txt_encoding(data)
+                # Chỉ thử encoding tiếp theo nếu phần sau vùng mẫu không giải mã được
+                encodings = DocumentReader.TXT_ENCODINGS
+                fallbacks = encodings[encodings.index(encoding) + 1:] if encoding in encodings else encodings[1:]
+                for candidate in [encoding] + fallbacks:
+                    try:
+                        with closing(DocumentReader._decode_txt(data, candidate)) as chunks:
+                            return "".join(chunks).strip()
+                    except UnicodeDecodeError:
+                        continue
             raise Exception("Không thể đọc file với các encoding đã thử")
         except Exception as e:
             raise Exception(f"Lỗi khi đọc TXT: {str(e)}")
+    
+    @staticmethod
+    @contextmanager
+    def _open_txt_data(source: DocumentSource):
+        """
+        Lấy toàn bộ bytes của nguồn TXT (một lần đọc)
+        
+        Buffer được dùng trực tiếp; file từ TXT_MMAP_THRESHOLD byte trở lên
+        được memory-map thay vì đọc vào bộ nhớ.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            yield source
+            return
+        
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                size = os.fstat(file.fileno()).st_size
+                if size >= TXT_MMAP_THRESHOLD:
+                    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        yield mapped
+                else:
+                    yield file.read()
+            return
+        
+        with DocumentReader._open_source(source) as file:
+            yield file.read()
+    
+    @staticmethod
+    def _detect_txt_encoding(data) -> str:
+        """Đoán encoding từ BOM và TXT_SAMPLE_BYTES byte đầu của dữ liệu"""
+        head = bytes(data[:4])
+        if head.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        
+        sample = data[:DocumentReader.TXT_SAMPLE_BYTES]
+        # Mẫu bị cắt có thể kết thúc giữa một ký tự nhiều byte nên không giải mã với final=True
+        final = len(sample) == len(data)
+        for encoding in DocumentReader.TXT_ENCODINGS[:-1]:
+            try:
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=final)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        return DocumentReader.TXT_ENCODINGS[-1]
+    
+    @staticmethod
+    def _decode_txt(data, encoding: str, errors: str = 'strict') -> Iterator[str]:
+        """Giải mã bytes theo chunk TXT_CHUNK_BYTES, chuẩn hóa xuống dòng như chế độ text"""
+        decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder(encoding)(errors), translate=True
+        )
+        with memoryview(data) as view:
+            chunk_size = DocumentReader.TXT_CHUNK_BYTES
+            for start in range(0, len(view), chunk_size):
+                with view[start:start + chunk_size] as chunk:
+                    yield decoder.decode(chunk, final=start + chunk_size >= len(view))
+    
+    @staticmethod
+    def _iter_txt_pages(source: DocumentSource) -> Iterator[Tuple[int, str]]:
+        """
+        Đọc file TXT theo chunk, tách trang theo ký tự form feed
+        
+        Encoding được đoán một lần từ phần đầu file; byte lỗi ở phần sau được
+        thay bằng U+FFFD vì không thể đọc lại phần đã trả về.
+        """
+        try:
+            with DocumentReader._open_txt_data(source) as data:
+                encoding = DocumentReader._detect_txt_encoding(data)
+                page_number = 1
+                with closing(DocumentReader._decode_txt(data, encoding, errors='replace')) as chunks:
+                    for chunk in chunks:
+                        parts = chunk.split('\f')
+                        for i, part in enumerate(parts):
+                            if i > 0:
+                                page_number += 1
+                            if part:
+                                yield page_number, part
+        except Exception as e:
+            raise Exception(f"Lỗi khi đọc TXT: {str(e)}")
+
 
+# Các engine có sẵn. PDF và DOCX nhận diện theo magic bytes, TXT theo phần mở rộng
+DocumentReader.register_reader('pdf', DocumentReader._iter_pdf_pages, DocumentReader._extract_pdf,
+                               sniff=DocumentReader._sniff_pdf, extensions=['.pdf'])
+DocumentReader.register_reader('docx', DocumentReader._iter_docx_pages, DocumentReader._extract_docx,
+                               sniff=DocumentReader._sniff_docx, extensions=['.docx'])
+DocumentReader.register_reader('txt', DocumentReader._iter_txt_pages, DocumentReader._extract_txt,
+                               extensions=['.txt'])
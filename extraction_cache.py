@@ -0,0 +1,159 @@
+"""
+Module cache kết quả trích xuất văn bản theo nội dung file
+"""
+
+import sqlite3
+import time
+from array import array
+from typing import Dict, Optional
+
+
+class ExtractionCache:
+    """
+    Cache bền vững (SQLite) cho kết quả trích xuất của DocumentReader
+    
+    Khóa là SHA-256 của nội dung file kết hợp với phiên bản reader, nên upload
+    lại cùng một file (dù khác tên) hay Streamlit rerun đều không phải parse lại.
+    Tổng dung lượng được giới hạn, vượt quá thì xóa các mục ít được dùng gần đây nhất (LRU).
+    """
+    
+    def __init__(self, db_path: str = "extraction_cache.db", max_bytes: int = 512 * 1024 * 1024):
+        """
+        Khởi tạo cache
+        
+        Args:
+            db_path: Đường dẫn đến file database của cache
+            max_bytes: Tổng dung lượng tối đa của các mục trong cache
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.init_database()
+    
+    def get_connection(self):
+        """Tạo connection đến database"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def init_database(self):
+        """Khởi tạo bảng cache nếu chưa tồn tại"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                content_hash TEXT NOT NULL,
+                reader_version INTEGER NOT NULL,
+                file_type TEXT NOT NULL,
+                content_text TEXT NOT NULL,
+                page_offsets BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (content_hash, reader_version)
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_extraction_cache_access ON extraction_cache(last_access)
+        """)
+        
+        conn.commit()
+        conn.close()
+    
+    def get(self, content_hash: str, reader_version: int) -> Optional[Dict]:
+        """
+        Lấy kết quả trích xuất đã cache
+        
+        Args:
+            content_hash: SHA-256 (hex) của nội dung file
+            reader_version: Phiên bản DocumentReader
+        
+        Returns:
+            Dict chứa text, file_type, page_offsets (array('I')) hoặc None
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT file_type, content_text, page_offsets FROM extraction_cache
+            WHERE content_hash = ? AND reader_version = ?
+        """, (content_hash, reader_version))
+        row = cursor.fetchone()
+        
+        if row:
+            # Cập nhật thời điểm truy cập cho LRU
+            cursor.execute("""
+                UPDATE extraction_cache SET last_access = ?
+                WHERE content_hash = ? AND reader_version = ?
+            """, (time.time(), content_hash, reader_version))
+            conn.commit()
+        conn.close()
+        
+        if not row:
+            return None
+        
+        page_offsets = array('I')
+        page_offsets.frombytes(row['page_offsets'])
+        return {
+            'text': row['content_text'],
+            'file_type': row['file_type'],
+            'page_offsets': page_offsets
+        }
+    
+    def put(self, content_hash: str, reader_version: int, text: str, file_type: str, page_offsets: array):
+        """
+        Lưu kết quả trích xuất vào cache và dọn bớt nếu vượt dung lượng
+        
+        Args:
+            content_hash: SHA-256 (hex) của nội dung file
+            reader_version: Phiên bản DocumentReader
+            text: Nội dung văn bản đã trích xuất
+            file_type: Loại file (pdf, docx, txt)
+            page_offsets: Vị trí ký tự bắt đầu của mỗi trang
+        """
+        offsets_data = page_offsets.tobytes()
+        size = len(text.encode('utf-8')) + len(offsets_data)
+        if size > self.max_bytes:
+            return
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT OR REPLACE INTO extraction_cache
+            (content_hash, reader_version, file_type, content_text, page_offsets, size, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (content_hash, reader_version, file_type, text, offsets_data, size, time.time()))
+        
+        self._evict(cursor)
+        conn.commit()
+        conn.close()
+    
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        conn = self.get_connection()
+        conn.execute("DELETE FROM extraction_cache")
+        conn.commit()
+        conn.close()
+    
+    def _evict(self, cursor):
+        """Xóa các mục ít được dùng gần đây nhất cho đến khi tổng dung lượng <= max_bytes"""
+        cursor.execute("SELECT SUM(size) FROM extraction_cache")
+        total_size = cursor.fetchone()[0] or 0
+        if total_size <= self.max_bytes:
+            return
+        
+        cursor.execute("""
+            SELECT content_hash, reader_version, size FROM extraction_cache
+            ORDER BY last_access ASC
+        """)
+        to_delete = []
+        for row in cursor.fetchall():
+            if total_size <= self.max_bytes:
+                break
+            to_delete.append((row['content_hash'], row['reader_version']))
+            total_size -= row['size']
+        
+        cursor.executemany("""
+            DELETE FROM extraction_cache WHERE content_hash = ? AND reader_version = ?
+        """, to_delete)
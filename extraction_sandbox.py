@@ -0,0 +1,220 @@
+"""
+Module chạy trích xuất văn bản trong process con có giới hạn thời gian, bộ nhớ và số trang
+"""
+
+import os
+import time
+import multiprocessing
+from contextlib import closing
+from typing import Dict, Optional
+from document_reader import DocumentReader, DocumentSource
+from config import (
+    SANDBOX_TIMEOUT, SANDBOX_MAX_MEMORY_MB, SANDBOX_MAX_PAGES, SANDBOX_START_METHOD
+)
+
+
+def _sandbox_worker(source, filename: Optional[str], max_pages: int, max_chars: Optional[int],
+                    max_memory_bytes: int, conn):
+    """Process con: đọc tài liệu theo trang và gửi từng trang về process cha"""
+    if not os.path.exists('/proc/self/statm'):
+        # Không theo dõi được RSS từ process cha: giới hạn vùng nhớ ảo thay thế
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (max_memory_bytes, max_memory_bytes))
+        except (ImportError, ValueError, OSError):
+            pass
+    
+    try:
+        length = 0
+        with closing(DocumentReader.iter_pages(source, filename)) as pages:
+            for page_number, text in pages:
+                if page_number > max_pages:
+                    conn.send(('page_limit', f"Vượt quá {max_pages} trang"))
+                    return
+                if max_chars is not None and length + len(text) > max_chars:
+                    # Dừng đọc ngay: phần còn lại của file không được parse
+                    conn.send(('page', (page_number, text[:max_chars - length])))
+                    conn.send(('char_limit', f"Vượt quá {max_chars} ký tự"))
+                    return
+                length += len(text)
+                conn.send(('page', (page_number, text)))
+        conn.send(('ok', None))
+    except MemoryError:
+        conn.send(('memory', "Vượt quá giới hạn bộ nhớ"))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+class ExtractionSandbox:
+    """
+    Trích xuất văn bản trong process con được giám sát
+    
+    Mỗi job có giới hạn thời gian (wall-clock), bộ nhớ (RSS) và số trang. Khi
+    chạm giới hạn, process con bị dừng và kết quả là phần văn bản đã trích
+    xuất được, kèm trạng thái để người gọi ghi nhận lỗi. Nhờ vậy một file
+    hỏng hoặc quá lớn không làm treo app của người dùng khác.
+    """
+    
+    # Chu kỳ kiểm tra process con (giây)
+    POLL_INTERVAL = 0.1
+    
+    # Phiên bản dùng trong cache trích xuất. Văn bản ghép từ iter_pages có thể khác
+    # kết quả DocumentReader.read_document (vd. TXT có ký tự form feed, DOCX khi không
+    # đọc theo luồng) nên dùng khóa riêng: số âm không trùng READER_VERSION
+    CACHE_VERSION = -DocumentReader.READER_VERSION
+    
+    def __init__(
+        self,
+        timeout: float = SANDBOX_TIMEOUT,
+        max_memory_mb: int = SANDBOX_MAX_MEMORY_MB,
+        max_pages: int = SANDBOX_MAX_PAGES,
+        max_chars: Optional[int] = None
+    ):
+        """
+        Khởi tạo sandbox
+        
+        Args:
+            timeout: Thời gian tối đa cho một job (giây)
+            max_memory_mb: Bộ nhớ RSS tối đa của process con (MB)
+            max_pages: Số trang tối đa được trích xuất
+            max_chars: Số ký tự tối đa được trích xuất (None: không giới hạn), dùng cho
+                bản xem trước của file ít trang nhưng dài (TXT, DOCX không ngắt trang)
+        """
+        self.timeout = timeout
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self._context = multiprocessing.get_context(SANDBOX_START_METHOD)
+    
+    def extract(self, source: DocumentSource, filename: Optional[str] = None, use_cache: bool = True,
+                content_hash: Optional[str] = None) -> Dict:
+        """
+        Trích xuất văn bản trong process con
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file (xem DocumentReader.read_file)
+            filename: Tên file để xác định định dạng
+            use_cache: Dùng cache trích xuất của DocumentReader (với khóa CACHE_VERSION riêng)
+            content_hash: SHA-256 nội dung file nếu người gọi đã tính (tránh băm lại file lớn)
+        
+        Returns:
+            Dict chứa text, file_type, page_offsets, content_hash, status ('ok', 'timeout',
+            'memory', 'page_limit', 'char_limit', 'error'), error, pages (số trang đã trích xuất)
+        """
+        if content_hash is None:
+            content_hash = DocumentReader.file_hash(source)
+        try:
+            file_type = DocumentReader.detect_format(source, filename)
+        except ValueError as e:
+            # Định dạng không đọc được: ghi nhận như một job lỗi, không cần chạy process con
+            return {
+                'text': "",
+                'file_type': DocumentReader._get_extension(source, filename).lstrip('.'),
+                'page_offsets': DocumentReader._join_pages([])[1],
+                'content_hash': content_hash,
+                'status': 'error',
+                'error': str(e),
+                'pages': 0
+            }
+        
+        cache = DocumentReader.get_cache() if use_cache else None
+        if cache is not None:
+            cached = cache.get(content_hash, ExtractionSandbox.CACHE_VERSION)
+            if cached:
+                return {
+                    'text': cached['text'],
+                    'file_type': cached['file_type'],
+                    'page_offsets': cached['page_offsets'],
+                    'content_hash': content_hash,
+                    'status': 'ok',
+                    'error': None,
+                    'pages': len(cached['page_offsets'])
+                }
+        
+        pages, status, error = self._run(source, filename)
+        text, page_offsets = DocumentReader._join_pages(pages)
+        
+        # Chỉ cache kết quả đầy đủ
+        if cache is not None and status == 'ok':
+            cache.put(content_hash, ExtractionSandbox.CACHE_VERSION, text, file_type, page_offsets)
+        
+        return {
+            'text': text,
+            'file_type': file_type,
+            'page_offsets': page_offsets,
+            'content_hash': content_hash,
+            'status': status,
+            'error': error,
+            'pages': len(pages)
+        }
+    
+    def _run(self, source: DocumentSource, filename: Optional[str]):
+        """Chạy process con, gom các trang nhận được cho đến khi xong hoặc chạm giới hạn"""
+        # Process con chỉ nhận được dữ liệu pickle được: đường dẫn hoặc bytes
+        if isinstance(source, (bytearray, memoryview)):
+            source = bytes(source)
+        elif not isinstance(source, (str, os.PathLike, bytes)):
+            with DocumentReader._open_source(source) as file:
+                source = file.read()
+        
+        parent_conn, child_conn = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_sandbox_worker,
+            args=(source, filename, self.max_pages, self.max_chars, self.max_memory_bytes, child_conn),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        
+        pages = []
+        current_page = None
+        status, error = 'ok', None
+        deadline = time.monotonic() + self.timeout
+        
+        try:
+            while True:
+                if time.monotonic() >= deadline:
+                    status, error = 'timeout', f"Quá thời gian {self.timeout} giây"
+                    break
+                if self._rss_bytes(process.pid) > self.max_memory_bytes:
+                    status, error = 'memory', "Vượt quá giới hạn bộ nhớ"
+                    break
+                if not parent_conn.poll(self.POLL_INTERVAL):
+                    continue
+                
+                try:
+                    kind, payload = parent_conn.recv()
+                except EOFError:
+                    # Process con kết thúc bất thường (bị hệ điều hành dừng, crash)
+                    process.join(1)
+                    status, error = 'error', f"Process trích xuất dừng bất thường (exit code {process.exitcode})"
+                    break
+                
+                if kind == 'page':
+                    page_number, text = payload
+                    if page_number != current_page:
+                        pages.append([])
+                        current_page = page_number
+                    pages[-1].append(text)
+                else:
+                    if kind != 'ok':
+                        status, error = kind, payload
+                    break
+        finally:
+            parent_conn.close()
+            if process.is_alive():
+                process.kill()
+            process.join()
+        
+        return ["".join(parts) for parts in pages], status, error
+    
+    @staticmethod
+    def _rss_bytes(pid: int) -> int:
+        """RSS hiện tại của process (0 nếu không đọc được /proc)"""
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return 0
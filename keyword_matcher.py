@@ -0,0 +1,115 @@
+"""
+Module so khớp nhiều từ khóa cùng lúc bằng automaton Aho-Corasick
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Sequence
+
+
+class KeywordMatcher:
+    """
+    Automaton Aho-Corasick đếm số lần xuất hiện của nhiều mẫu trong một lần quét
+    
+    Automaton được dựng một lần từ danh sách mẫu và chuyển thành bảng chuyển
+    trạng thái đầy đủ (đã gộp failure link), nên mỗi ký hiệu của văn bản chỉ
+    tốn một lần tra dict bất kể số mẫu. Mẫu là dãy ký hiệu hashable bất kỳ:
+    chuỗi (theo ký tự) hoặc tuple mã token.
+    
+    Số đếm của mỗi mẫu giống str.count: các lần xuất hiện của cùng một mẫu
+    không chồng lên nhau, còn các mẫu khác nhau được đếm độc lập.
+    """
+    
+    def __init__(self, patterns: Iterable[Sequence[Hashable]]):
+        """
+        Dựng automaton
+        
+        Args:
+            patterns: Các mẫu cần tìm (mẫu rỗng bị bỏ qua khi quét)
+        """
+        self.patterns = [tuple(pattern) if not isinstance(pattern, str) else pattern
+                         for pattern in patterns]
+        self.lengths = [len(pattern) for pattern in self.patterns]
+        
+        # Trie: goto[node] = {ký hiệu: node con}, output[node] = các mẫu kết thúc tại node
+        goto: List[Dict] = [{}]
+        output: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            node = 0
+            for symbol in pattern:
+                child = goto[node].get(symbol)
+                if child is None:
+                    child = len(goto)
+                    goto[node][symbol] = child
+                    goto.append({})
+                    output.append([])
+                node = child
+            output[node].append(pattern_id)
+        
+        # Duyệt theo chiều rộng để tính failure link và bảng chuyển đầy đủ:
+        # delta[node] = delta[fail[node]] ghi đè bởi các cạnh của trie tại node
+        fail = [0] * len(goto)
+        delta: List[Dict] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            transitions = dict(delta[fail[node]])
+            for symbol, child in goto[node].items():
+                fail[child] = delta[fail[node]].get(symbol, 0)
+                output[child].extend(output[fail[child]])
+                transitions[symbol] = child
+                queue.append(child)
+            delta[node] = transitions
+        
+        self._delta = delta
+        self._output = [tuple(pattern_ids) for pattern_ids in output]
+    
+    def stream(self) -> 'MatchStream':
+        """Tạo bộ đếm theo luồng (giữ trạng thái qua ranh giới giữa các đoạn)"""
+        return MatchStream(self)
+    
+    def count(self, symbols: Sequence[Hashable]) -> List[int]:
+        """
+        Đếm số lần xuất hiện của từng mẫu trong một dãy ký hiệu
+        
+        Returns:
+            List số lần xuất hiện, theo thứ tự của patterns
+        """
+        stream = self.stream()
+        stream.feed(symbols)
+        return stream.counts
+
+
+class MatchStream:
+    """Trạng thái quét của KeywordMatcher trên một văn bản được đưa vào theo từng đoạn"""
+    
+    def __init__(self, matcher: KeywordMatcher):
+        self.matcher = matcher
+        self.counts = [0] * len(matcher.patterns)
+        self._node = 0
+        self._position = 0
+        # Vị trí kết thúc lần đếm gần nhất của mỗi mẫu (để không đếm chồng lấn)
+        self._last_end = [-1] * len(matcher.patterns)
+    
+    def feed(self, symbols: Sequence[Hashable]):
+        """Quét tiếp một đoạn; mẫu nằm vắt qua ranh giới hai đoạn vẫn được đếm"""
+        delta = self.matcher._delta
+        output = self.matcher._output
+        lengths = self.matcher.lengths
+        counts = self.counts
+        last_end = self._last_end
+        node = self._node
+        position = self._position
+        
+        for symbol in symbols:
+            node = delta[node].get(symbol, 0)
+            if output[node]:
+                for pattern_id in output[node]:
+                    if position - lengths[pattern_id] >= last_end[pattern_id]:
+                        counts[pattern_id] += 1
+                        last_end[pattern_id] = position
+            position += 1
+        
+        self._node = node
+        self._position = position
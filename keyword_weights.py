@@ -0,0 +1,56 @@
+"""
+Module trọng số IDF của từ khóa theo tần suất tài liệu trong kho đã lưu
+"""
+
+import math
+from typing import Dict
+
+
+class KeywordWeights:
+    """
+    Trọng số của từng từ khóa khi tính điểm phân loại
+    
+    weight = log((N + 1) / (df + 1)) + 1, với N là số tài liệu trong kho và df
+    là số tài liệu có chứa từ khóa (DocumentDB cập nhật dần khi lưu/xóa tài
+    liệu). Từ khóa chung chung xuất hiện ở hầu hết tài liệu có trọng số gần 1,
+    từ khóa đặc thù hiếm gặp có trọng số cao hơn. Bảng trọng số được tính sẵn
+    một lần nên lúc phân loại chỉ là tra dict, không quét lại kho tài liệu.
+    """
+    
+    def __init__(self, document_count: int = 0, document_frequencies: Dict[str, int] = None,
+                 version: int = 0):
+        """
+        Args:
+            document_count: Số tài liệu N đã được thống kê
+            document_frequencies: Dict {từ khóa: số tài liệu chứa từ khóa}
+            version: Phiên bản thống kê (tăng sau mỗi lần lưu/xóa tài liệu)
+        """
+        self.document_count = document_count
+        self.version = version
+        self.default_weight = math.log(document_count + 1) + 1
+        self.weights: Dict[str, float] = {
+            keyword: math.log((document_count + 1) / (df + 1)) + 1
+            for keyword, df in (document_frequencies or {}).items()
+        }
+    
+    @property
+    def is_active(self) -> bool:
+        """Đã có tài liệu nào được thống kê (chưa có thì mọi từ khóa có trọng số 1)"""
+        return self.document_count > 0
+    
+    def weight(self, keyword: str) -> float:
+        """Trọng số của từ khóa (chưa xuất hiện trong tài liệu nào: trọng số lớn nhất)"""
+        if not self.is_active:
+            return 1
+        return self.weights.get(keyword, self.default_weight)
+    
+    @staticmethod
+    def from_db(db) -> 'KeywordWeights':
+        """
+        Đọc thống kê tần suất từ khóa từ DocumentDB
+        
+        Args:
+            db: DocumentDB
+        """
+        stats = db.get_keyword_frequencies()
+        return KeywordWeights(stats['documents'], stats['frequencies'], stats['version'])
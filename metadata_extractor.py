@@ -3,13 +3,21 @@ Module trích xuất metadata từ tài liệu (loại văn bản, cơ quan ban
 """
 
 import re
-from typing import Dict, Optional, Tuple
+from re import Match, Pattern
+from typing import Dict, Iterable, Optional, Tuple
 from datetime import datetime
+from normalizer import NormalizedText, TextLike
 
 
 class MetadataExtractor:
     """Class trích xuất metadata từ nội dung tài liệu"""
     
+    # Phiên bản logic trích xuất metadata - tăng khi kết quả thay đổi để bỏ qua kết quả đã ghi nhớ
+    EXTRACTOR_VERSION = 3
+    
+    # Số ký tự đầu tài liệu được dùng để trích xuất metadata
+    PREVIEW_CHARS = 1500
+    
     # Các loại văn bản phổ biến
     DOCUMENT_TYPES = [
         'Nghị định',
@@ -38,52 +46,112 @@ class MetadataExtractor:
         r'Chủ\s+tịch'
     ]
     
+    # Cơ quan ban hành dạng "CỦA [cơ quan]" (dùng khi không khớp AGENCY_PATTERNS)
+    AGENCY_OF_PATTERN = r'(?:CỦA|của)\s+([A-ZÀÁẠẢÃÂẦẤẬẨẪĂẰẮẶẲẴÈÉẸẺẼÊỀẾỆỂỄÌÍỊỈĨÒÓỌỎÕÔỒỐỘỔỖƠỜỚỢỞỠÙÚỤỦŨƯỪỨỰỬỮỲÝỴỶỸĐ][^,\n.]+)'
+    
+    # Các pattern ngày tháng - ưu tiên các pattern có từ khóa "ban hành", "ngày"
+    PRIORITY_DATE_PATTERNS = [
+        # ngày DD/MM/YYYY ban hành hoặc ban hành ngày DD/MM/YYYY
+        r'(?:ban\s+hành|ngày)\s+(\d{1,2})[/-](\d{1,2})[/-](\d{4})',
+        # ngày DD tháng MM năm YYYY (tiếng Việt) - có từ "ban hành"
+        r'(?:ban\s+hành|ngày)\s+(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})',
+    ]
+    
+    # Các pattern ngày tháng thông thường
+    DATE_PATTERNS = [
+        # DD/MM/YYYY hoặc DD-MM-YYYY
+        r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})',
+        # YYYY/MM/DD hoặc YYYY-MM-DD
+        r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',
+        # DD tháng MM năm YYYY (tiếng Việt)
+        r'(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})',
+        # ngày DD tháng MM năm YYYY
+        r'ngày\s+(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})'
+    ]
+    
+    # Số hiệu văn bản: "Số: 123/2024/NĐ-CP", "Số 45/QĐ-UBND", "Luật số: 50/2014/QH13"
+    # (ký hiệu bắt đầu bằng chữ để không nhầm với ngày tháng "12/2023"; ký hiệu luôn viết hoa
+    # nên phần này không phân biệt hoa/thường dù pattern được biên dịch với re.IGNORECASE)
+    DOCUMENT_NUMBER_PATTERN = r'\bsố\s*(?:hiệu)?\s*:?\s*(\d{1,6}(?:/\d{4})?/(?-i:[A-ZĐ][A-ZĐ0-9]*(?:[-/][A-ZĐ0-9]+)*))'
+    
+    # Vùng tìm loại văn bản, cơ quan ban hành và số hiệu (thường nằm ở phần đầu)
+    HEADER_CHARS = 1000
+    
     @staticmethod
-    def extract_metadata(content: str, filename: str = "") -> Dict[str, Optional[str]]:
+    def extract_metadata(content: TextLike, filename: str = "") -> Dict[str, Optional[str]]:
         """
         Trích xuất metadata từ nội dung tài liệu
         
         Args:
-            content: Nội dung văn bản
+            content: Nội dung văn bản (chuỗi hoặc NormalizedText)
             filename: Tên file
             
         Returns:
-            Dict chứa document_type, issuing_agency, issue_date
+            Dict chứa document_type, issuing_agency, issue_date, document_number
         """
-        content_lower = content.lower()
+        # Các pattern dùng re.IGNORECASE trên văn bản NFC, không cần bản viết thường
+        content = NormalizedText.of(content).nfc
+        
+        # Quét phần đầu văn bản một lần, lấy ứng viên của tất cả các pattern
+        header = HeaderScan(content[:MetadataExtractor.PREVIEW_CHARS])
         
         # Trích xuất loại văn bản
-        document_type = MetadataExtractor._extract_document_type(content, content_lower, filename)
+        document_type = MetadataExtractor._extract_document_type(header, filename)
         
         # Trích xuất cơ quan ban hành
-        issuing_agency = MetadataExtractor._extract_issuing_agency(content, content_lower)
+        issuing_agency = MetadataExtractor._extract_issuing_agency(header)
         
         # Trích xuất ngày ban hành
-        issue_date = MetadataExtractor._extract_issue_date(content, content_lower)
+        issue_date = MetadataExtractor._extract_issue_date(header)
+        
+        # Trích xuất số hiệu văn bản
+        document_number = MetadataExtractor._extract_document_number(header)
         
         return {
             'document_type': document_type,
             'issuing_agency': issuing_agency,
-            'issue_date': issue_date
+            'issue_date': issue_date,
+            'document_number': document_number
         }
     
     @staticmethod
-    def _extract_document_type(content: str, content_lower: str, filename: str) -> Optional[str]:
-        """Trích xuất loại văn bản"""
-        # Lấy 1000 ký tự đầu (thường có thông tin loại văn bản ở đầu)
-        preview = content[:1000]
-        preview_lower = preview.lower()
+    def extract_metadata_from_blocks(blocks: Iterable[Tuple[int, str]], filename: str = "") -> Dict[str, Optional[str]]:
+        """
+        Trích xuất metadata từ luồng block (DocumentReader.iter_blocks)
         
-        # Tìm trong nội dung với nhiều pattern khác nhau
-        for doc_type in MetadataExtractor.DOCUMENT_TYPES:
-            patterns = [
-                rf'{doc_type}\s+số\s+\d+',  # "Nghị định số 123"
-                rf'{doc_type}\s+\d+',        # "Nghị định 123"
-                rf'{doc_type}\s+[^\s]+',    # "Nghị định ..."
-            ]
-            for pattern in patterns:
-                if re.search(pattern, preview, re.IGNORECASE):
-                    return doc_type
+        Metadata chỉ nằm ở phần đầu văn bản nên dừng đọc ngay khi đủ PREVIEW_CHARS ký tự.
+        
+        Args:
+            blocks: Các tuple (số trang, đoạn văn bản)
+            filename: Tên file
+            
+        Returns:
+            Dict chứa document_type, issuing_agency, issue_date, document_number
+        """
+        parts = []
+        length = 0
+        for _, text in blocks:
+            if not parts:
+                # Bỏ khoảng trắng đầu văn bản như read_file
+                text = text.lstrip()
+                if not text:
+                    continue
+            parts.append(text)
+            length += len(text)
+            if length >= MetadataExtractor.PREVIEW_CHARS:
+                break
+        
+        preview = "".join(parts)[:MetadataExtractor.PREVIEW_CHARS]
+        return MetadataExtractor.extract_metadata(preview, filename)
+    
+    @staticmethod
+    def _extract_document_type(header: 'HeaderScan', filename: str) -> Optional[str]:
+        """Trích xuất loại văn bản"""
+        # Tìm trong HEADER_CHARS ký tự đầu (thường có thông tin loại văn bản ở đầu),
+        # "Nghị định số 123", "Nghị định 123", "Nghị định ..." theo thứ tự DOCUMENT_TYPES
+        for index, doc_type in enumerate(MetadataExtractor.DOCUMENT_TYPES):
+            if header.first(f'type{index}', MetadataExtractor.HEADER_CHARS):
+                return doc_type
         
         # Tìm trong tên file
         filename_lower = filename.lower()
@@ -94,14 +162,11 @@ class MetadataExtractor:
         return None
     
     @staticmethod
-    def _extract_issuing_agency(content: str, content_lower: str) -> Optional[str]:
+    def _extract_issuing_agency(header: 'HeaderScan') -> Optional[str]:
         """Trích xuất cơ quan ban hành"""
-        # Lấy 1000 ký tự đầu (thường có thông tin cơ quan ban hành ở đầu)
-        preview = content[:1000]
-        
-        # Tìm các pattern cơ quan ban hành
-        for pattern in MetadataExtractor.AGENCY_PATTERNS:
-            match = re.search(pattern, preview, re.IGNORECASE)
+        # Tìm các pattern cơ quan ban hành trong HEADER_CHARS ký tự đầu
+        for index in range(len(MetadataExtractor.AGENCY_PATTERNS)):
+            match = header.first(f'agency{index}', MetadataExtractor.HEADER_CHARS)
             if match:
                 agency = match.group(0).strip()
                 # Làm sạch: loại bỏ dấu phẩy, dấu chấm ở cuối
@@ -113,8 +178,7 @@ class MetadataExtractor:
                     return agency
         
         # Tìm pattern "CỦA [cơ quan]" hoặc "của [cơ quan]"
-        pattern_cua = r'(?:CỦA|của)\s+([A-ZÀÁẠẢÃÂẦẤẬẨẪĂẰẮẶẲẴÈÉẸẺẼÊỀẾỆỂỄÌÍỊỈĨÒÓỌỎÕÔỒỐỘỔỖƠỜỚỢỞỠÙÚỤỦŨƯỪỨỰỬỮỲÝỴỶỸĐ][^,\n.]+)'
-        match = re.search(pattern_cua, preview, re.IGNORECASE)
+        match = header.first('agency_of', MetadataExtractor.HEADER_CHARS)
         if match:
             agency = match.group(1).strip()
             agency = agency.rstrip('.,;:')
@@ -124,55 +188,161 @@ class MetadataExtractor:
         return None
     
     @staticmethod
-    def _extract_issue_date(content: str, content_lower: str) -> Optional[str]:
+    def _extract_issue_date(header: 'HeaderScan') -> Optional[str]:
         """Trích xuất ngày ban hành"""
-        # Lấy 1500 ký tự đầu (tăng để tìm ngày ban hành tốt hơn)
-        preview = content[:1500]
+        # Tìm với priority patterns trước
+        for index in range(len(MetadataExtractor.PRIORITY_DATE_PATTERNS)):
+            match = header.first(f'priority_date{index}')
+            if match:
+                day, month, year = match.groups()
+                # Chuyển về format DD/MM/YYYY
+                return f"{day.zfill(2)}/{month.zfill(2)}/{year}"
         
-        # Các pattern ngày tháng - ưu tiên các pattern có từ khóa "ban hành", "ngày"
-        priority_patterns = [
-            # ngày DD/MM/YYYY ban hành hoặc ban hành ngày DD/MM/YYYY
-            r'(?:ban\s+hành|ngày)\s+(\d{1,2})[/-](\d{1,2})[/-](\d{4})',
-            # ngày DD tháng MM năm YYYY (tiếng Việt) - có từ "ban hành"
-            r'(?:ban\s+hành|ngày)\s+(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})',
-        ]
+        for index in range(len(MetadataExtractor.DATE_PATTERNS)):
+            # Lấy match đầu tiên (thường là ngày ban hành)
+            match = header.first(f'date{index}')
+            if match:
+                # Chuyển về format DD/MM/YYYY
+                if len(match.group(3)) == 4:  # YYYY ở cuối (DD/MM/YYYY)
+                    day, month, year = match.groups()
+                else:  # YYYY ở đầu (YYYY/MM/DD)
+                    year, month, day = match.groups()
+                return f"{day.zfill(2)}/{month.zfill(2)}/{year}"
         
-        # Tìm với priority patterns trước
-        for pattern in priority_patterns:
-            matches = re.findall(pattern, preview, re.IGNORECASE)
-            if matches:
-                match = matches[0]
-                if len(match) == 3:
-                    # Chuyển về format DD/MM/YYYY
-                    if len(match[2]) == 4:  # YYYY ở cuối
-                        day, month, year = match[0], match[1], match[2]
-                        return f"{day.zfill(2)}/{month.zfill(2)}/{year}"
-        
-        # Các pattern ngày tháng thông thường
-        date_patterns = [
-            # DD/MM/YYYY hoặc DD-MM-YYYY
-            r'(\d{1,2})[/-](\d{1,2})[/-](\d{4})',
-            # YYYY/MM/DD hoặc YYYY-MM-DD
-            r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})',
-            # DD tháng MM năm YYYY (tiếng Việt)
-            r'(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})',
-            # ngày DD tháng MM năm YYYY
-            r'ngày\s+(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})'
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, preview, re.IGNORECASE)
-            if matches:
-                # Lấy match đầu tiên (thường là ngày ban hành)
-                match = matches[0]
-                if len(match) == 3:
-                    # Chuyển về format DD/MM/YYYY
-                    if len(match[2]) == 4:  # YYYY ở cuối (DD/MM/YYYY)
-                        day, month, year = match[0], match[1], match[2]
-                        return f"{day.zfill(2)}/{month.zfill(2)}/{year}"
-                    else:  # YYYY ở đầu (YYYY/MM/DD)
-                        day, month, year = match[2], match[1], match[0]
-                        return f"{day.zfill(2)}/{month.zfill(2)}/{year}"
+        return None
+
+    @staticmethod
+    def _extract_document_number(header: 'HeaderScan') -> Optional[str]:
+        """
+        Trích xuất số hiệu văn bản (lần xuất hiện đầu tiên - các số hiệu sau thường là văn bản được dẫn chiếu)
         
+        >>> number = lambda text: MetadataExtractor.extract_metadata(text)['document_number']
+        >>> number("CHÍNH PHỦ\\nSố: 123/2024/NĐ-CP\\nCăn cứ Nghị định số 15/2021/NĐ-CP")
+        '123/2024/NĐ-CP'
+        >>> number("QUỐC HỘI\\nLuật số: 50/2014/QH13")
+        '50/2014/QH13'
+        >>> number("Có tổng số 3/a thành viên")
+        >>> number("Trong tổng số 12/2023 hộ dân")
+        >>> number("Hồ sơ số 5/ab-cd")
+        """
+        match = header.first('document_number', MetadataExtractor.HEADER_CHARS)
+        if match:
+            return match.group(1).rstrip('-/')
         return None
+    
+    @staticmethod
+    def document_number_key(document_number: Optional[str]) -> Optional[str]:
+        """
+        Dạng chuẩn của số hiệu văn bản để so khớp và đánh index
+        
+        Viết hoa, bỏ khoảng trắng, thống nhất dấu gạch và chữ Đ, bỏ số 0 ở đầu:
+        "05 / 2024 / nđ – cp" -> "5/2024/NĐ-CP".
+        
+        Args:
+            document_number: Số hiệu (trích xuất được hoặc người dùng nhập)
+        
+        Returns:
+            Số hiệu dạng chuẩn hoặc None nếu rỗng
+        """
+        if not document_number:
+            return None
+        key = NormalizedText(document_number).nfc.upper()
+        key = re.sub(r'\s+', '', key).translate(_DOCUMENT_NUMBER_TABLE).strip('-/')
+        key = re.sub(r'^0+(?=\d)', '', key)
+        return key or None
+
+
+# Các ký tự hay bị trích xuất sai từ PDF: dấu gạch dài -> "-", "Ð" (Eth) -> "Đ"
+_DOCUMENT_NUMBER_TABLE = str.maketrans({'\u2010': '-', '\u2011': '-', '\u2012': '-', '\u2013': '-',
+                                        '\u2014': '-', '\u2212': '-', '\u00d0': '\u0110'})
+
+
+def _lowercase_pattern(pattern: str) -> str:
+    """Viết thường phần chữ của pattern, giữ nguyên các escape (\\s, \\S, \\d, ...)"""
+    return re.sub(r'\\.|[^\\]+', lambda m: m.group(0) if m.group(0).startswith('\\') else m.group(0).lower(),
+                  pattern)
+
+
+def _compile_header_patterns() -> Tuple[Dict[str, Pattern], Dict[str, Pattern]]:
+    """
+    Biên dịch một lần tất cả pattern metadata
+    
+    Returns:
+        tuple: (pattern theo tên có re.IGNORECASE - dùng trên văn bản gốc,
+        pattern theo tên đã viết thường không có re.IGNORECASE - dùng để quét
+        bản viết thường của phần đầu văn bản)
+    """
+    patterns = {}
+    for index, doc_type in enumerate(MetadataExtractor.DOCUMENT_TYPES):
+        patterns[f'type{index}'] = rf'{doc_type}\s+[^\s]+'
+    for index, pattern in enumerate(MetadataExtractor.AGENCY_PATTERNS):
+        patterns[f'agency{index}'] = pattern
+    patterns['agency_of'] = MetadataExtractor.AGENCY_OF_PATTERN
+    for index, pattern in enumerate(MetadataExtractor.PRIORITY_DATE_PATTERNS):
+        patterns[f'priority_date{index}'] = pattern
+    for index, pattern in enumerate(MetadataExtractor.DATE_PATTERNS):
+        patterns[f'date{index}'] = pattern
+    patterns['document_number'] = MetadataExtractor.DOCUMENT_NUMBER_PATTERN
+    
+    compiled = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in patterns.items()}
+    # re.IGNORECASE chậm hơn nhiều với ký tự tiếng Việt và làm mất tối ưu tiền tố
+    # chữ cố định của re, nên việc tìm vị trí được làm trên bản viết thường
+    lowered = {name: re.compile(_lowercase_pattern(pattern)) for name, pattern in patterns.items()}
+    return compiled, lowered
+
+
+class HeaderScan:
+    """
+    Phần đầu một văn bản đã chuẩn bị sẵn để tìm các pattern metadata
+    
+    Phần đầu được viết thường một lần; mỗi pattern chỉ được quét khi cần và
+    kết quả được giữ lại. first() cho kết quả giống re.search của từng
+    pattern trên text[:limit].
+    """
+    
+    def __init__(self, text: str):
+        """
+        Args:
+            text: Phần đầu văn bản (NFC)
+        """
+        self.text = text
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Hiếm gặp (vd. "İ"): giữ đúng vị trí ký tự giữa hai bản
+            lowered = ''.join(char.lower()[0] for char in text)
+        self.lowered = lowered
+        # Lần khớp đầu tiên đã tìm được của mỗi pattern (theo tên, limit)
+        self._found: Dict[Tuple[str, Optional[int]], Optional[Match]] = {}
+    
+    def first(self, name: str, limit: Optional[int] = None) -> Optional[Match]:
+        """
+        Lần khớp đầu tiên của pattern trong limit ký tự đầu
+        
+        Args:
+            name: Tên pattern (xem _compile_header_patterns)
+            limit: Chỉ xét text[:limit] (mặc định toàn bộ phần đầu)
+        """
+        key = (name, limit)
+        if key in self._found:
+            return self._found[key]
+        
+        limit = len(self.text) if limit is None else limit
+        pattern = _PATTERNS[name]
+        lowered_pattern = _LOWERED_PATTERNS[name]
+        position = 0
+        match = None
+        while True:
+            candidate = lowered_pattern.search(self.lowered, position, limit)
+            if candidate is None:
+                break
+            # Khớp lại trên văn bản gốc để các group giữ nguyên chữ hoa/thường
+            match = pattern.match(self.text, candidate.start(), limit)
+            if match:
+                break
+            position = candidate.start() + 1
+        
+        self._found[key] = match
+        return match
+
 
+_PATTERNS, _LOWERED_PATTERNS = _compile_header_patterns()
@@ -0,0 +1,66 @@
+"""
+Module chuẩn hóa văn bản tiếng Việt dùng chung cho các bước xử lý tài liệu
+"""
+
+import hashlib
+import unicodedata
+from functools import cached_property
+from typing import Union
+
+
+# Bỏ dấu: xóa các dấu kết hợp (U+0300 - U+036F) sau khi tách NFD, đ -> d
+_FOLD_TABLE = {code: None for code in range(0x0300, 0x0370)}
+_FOLD_TABLE[ord('đ')] = 'd'
+
+
+class NormalizedText:
+    """
+    Văn bản của một tài liệu kèm các dạng chuẩn hóa, mỗi dạng tính một lần khi được dùng đến
+    
+    - nfc: chuẩn hóa Unicode NFC (văn bản trích xuất từ PDF hay gặp dạng tổ hợp NFD)
+    - lower: nfc viết thường
+    - folded: lower bỏ dấu tiếng Việt ("Nhà ở xã hội" -> "nha o xa hoi")
+    - digest: SHA-256 (hex) của văn bản gốc, dùng làm khóa cache
+    
+    Tạo một lần cho mỗi tài liệu rồi truyền cho classifier, analyzer và
+    metadata extractor để các bước không phải tự tạo bản sao viết thường.
+    """
+    
+    def __init__(self, raw: str):
+        """
+        Args:
+            raw: Văn bản gốc
+        """
+        self.raw = raw
+    
+    @staticmethod
+    def of(text: Union[str, 'NormalizedText']) -> 'NormalizedText':
+        """Bọc chuỗi thành NormalizedText (giữ nguyên nếu đã là NormalizedText)"""
+        return text if isinstance(text, NormalizedText) else NormalizedText(text)
+    
+    @cached_property
+    def nfc(self) -> str:
+        # Văn bản đã ở dạng NFC được trả về nguyên object, không sao chép
+        return unicodedata.normalize('NFC', self.raw)
+    
+    @cached_property
+    def lower(self) -> str:
+        return self.nfc.lower()
+    
+    @cached_property
+    def folded(self) -> str:
+        return unicodedata.normalize('NFD', self.lower).translate(_FOLD_TABLE)
+    
+    @cached_property
+    def digest(self) -> str:
+        return hashlib.sha256(self.raw.encode('utf-8', 'surrogatepass')).hexdigest()
+    
+    def __str__(self) -> str:
+        return self.nfc
+    
+    def __len__(self) -> int:
+        return len(self.nfc)
+
+
+# Các hàm xử lý nhận chuỗi thường hoặc văn bản đã chuẩn hóa
+TextLike = Union[str, NormalizedText]
@@ -0,0 +1,23 @@
+"""
+Module tra cứu trang theo bảng vị trí trang (page_offsets) của văn bản đã trích xuất
+"""
+
+from array import array
+from bisect import bisect_right
+from typing import Optional, Tuple
+
+
+def page_of(page_offsets: array, position: int) -> int:
+    """Số trang (bắt đầu từ 1) chứa ký tự ở vị trí position"""
+    return max(bisect_right(page_offsets, position), 1)
+
+
+def page_span(page_offsets: array, first_page: int, last_page: Optional[int], text_length: int) -> Tuple[int, int]:
+    """Khoảng ký tự [start, end) của các trang [first_page, last_page]"""
+    if last_page is None:
+        last_page = first_page
+    if not page_offsets or first_page > len(page_offsets) or last_page < first_page:
+        return text_length, text_length
+    start = page_offsets[max(first_page, 1) - 1]
+    end = page_offsets[last_page] if last_page < len(page_offsets) else text_length
+    return start, end
@@ -0,0 +1,305 @@
+"""
+Module pipeline xử lý tài liệu theo các bước: đọc, chuẩn hóa, phân loại, metadata, phân tích, lưu
+
+Ví dụ:
+    python pipeline.py tai_lieu.pdf cong_van.docx
+    python pipeline.py --save --db documents.db ./uploads/*.pdf
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from analyzer import DocumentAnalyzer
+from classifier import DocumentClassifier
+from config import PIPELINE_MEMO_MAX_ENTRIES
+from document_reader import DocumentReader, DocumentSource
+from keyword_weights import KeywordWeights
+from metadata_extractor import MetadataExtractor
+from normalizer import NormalizedText, TextLike
+from taxonomy import Taxonomy, get_taxonomy
+
+
+class DocumentPipeline:
+    """
+    Các bước xử lý một tài liệu, dùng chung cho app Streamlit, dòng lệnh và job hàng loạt
+    
+    Kết quả các bước phân loại, metadata và phân tích được ghi nhớ (LRU trong
+    bộ nhớ) theo khóa gồm tên bước, SHA-256 nội dung, phiên bản của bước và
+    các tham số đầu vào khác. Gọi lại một bước với cùng đầu vào (vd. Streamlit
+    rerun) trả ngay kết quả cũ; khi taxonomy, mô hình thống kê hay logic của
+    bước đổi phiên bản thì khóa đổi theo và bước được chạy lại. Bước đọc và
+    chuẩn hóa trả về toàn bộ văn bản nên không được ghi nhớ (bước đọc đã có
+    ExtractionCache trên đĩa), nhờ vậy bộ nhớ ghi nhớ chỉ chứa các kết quả
+    nhỏ. Bước persist ghi vào database nên cũng không được ghi nhớ.
+    """
+    
+    def __init__(self, db=None, statistical=None, taxonomy: Optional[Taxonomy] = None,
+                 max_entries: int = PIPELINE_MEMO_MAX_ENTRIES):
+        """
+        Khởi tạo pipeline
+        
+        Args:
+            db: DocumentDB (dùng cho trọng số IDF từ khóa và bước persist, có thể None)
+            statistical: StatisticalClassifier kết hợp khi phân loại (có thể None)
+            taxonomy: Bộ phân loại (mặc định get_taxonomy(), tự nạp lại khi taxonomy.json đổi)
+            max_entries: Số kết quả tối đa được ghi nhớ
+        """
+        self.db = db
+        self.statistical = statistical
+        self._taxonomy = taxonomy
+        self.max_entries = max_entries
+        self._memo: OrderedDict = OrderedDict()
+    
+    @property
+    def taxonomy(self) -> Taxonomy:
+        """Bộ phân loại đang dùng"""
+        return self._taxonomy or get_taxonomy()
+    
+    def read(self, source: DocumentSource, filename: Optional[str] = None) -> Dict:
+        """
+        Bước đọc: trích xuất văn bản từ file (qua cache trích xuất của DocumentReader)
+        
+        Args:
+            source: Đường dẫn đến file hoặc nội dung file (xem DocumentReader.read_file)
+            filename: Tên file để xác định định dạng
+        
+        Returns:
+            Dict chứa text, file_type, page_offsets, content_hash (SHA-256 nội dung file)
+        """
+        text, file_type, page_offsets = DocumentReader.read_document(source, filename)
+        return {
+            'text': text,
+            'file_type': file_type,
+            'page_offsets': page_offsets,
+            'content_hash': DocumentReader.file_hash(source)
+        }
+    
+    def normalize(self, content: TextLike) -> NormalizedText:
+        """
+        Bước chuẩn hóa: NormalizedText của văn bản
+        
+        Truyền lại NormalizedText nhận được cho các bước sau (như process) để
+        các dạng chuẩn hóa (nfc, lower, ...) đã tính được dùng lại.
+        """
+        return NormalizedText.of(content)
+    
+    def keyword_weights(self) -> Optional[KeywordWeights]:
+        """Trọng số IDF của từ khóa theo các tài liệu đã lưu (None nếu không có database)"""
+        return KeywordWeights.from_db(self.db) if self.db is not None else None
+    
+    def classify(self, content: TextLike, filename: str = "", page_offsets: Optional[array] = None,
+                 weights: Optional[KeywordWeights] = None) -> Dict:
+        """
+        Bước phân loại
+        
+        Args:
+            content: Nội dung văn bản
+            filename: Tên file
+            page_offsets: Bảng vị trí trang - nếu có thì phân loại trên mẫu trang
+                (DocumentClassifier.classify_sampled)
+            weights: Trọng số IDF của từ khóa (mặc định đọc từ database)
+        
+        Returns:
+            Dict kết quả phân loại
+        """
+        normalized = self.normalize(content)
+        taxonomy = self.taxonomy
+        if weights is None:
+            weights = self.keyword_weights()
+        content_hash, version, params = DocumentClassifier.cache_key(
+            normalized, taxonomy, self.statistical, weights,
+            filename=filename, sampled=page_offsets is not None
+        )
+        
+        def compute() -> Dict:
+            if page_offsets is None:
+                return DocumentClassifier.classify(normalized, filename, taxonomy,
+                                                   statistical=self.statistical, weights=weights)
+            return DocumentClassifier.classify_sampled(normalized, page_offsets, filename, taxonomy,
+                                                       statistical=self.statistical, weights=weights)
+        
+        return self._memoize('classify', content_hash, version, params, compute)
+    
+    def metadata(self, content: TextLike, filename: str = "") -> Dict[str, Optional[str]]:
+        """Bước trích xuất metadata (loại văn bản, cơ quan ban hành, ngày ban hành, số hiệu)"""
+        normalized = self.normalize(content)
+        return self._memoize('metadata', normalized.digest, MetadataExtractor.EXTRACTOR_VERSION, filename,
+                             lambda: MetadataExtractor.extract_metadata(normalized, filename))
+    
+    def analyze(self, content: TextLike, filename: str, classification: Dict,
+                use_openai: bool = False) -> Dict:
+        """
+        Bước phân tích (tóm tắt, từ khóa, tags, dự án, mức độ bảo mật, ...)
+        
+        Kết quả phụ thuộc cả kết quả phân loại nên kết quả phân loại (dạng
+        JSON) là một phần của khóa; tóm tắt bằng OpenAI cũng được ghi nhớ nên
+        rerun không gọi lại API.
+        """
+        normalized = self.normalize(content)
+        classification_hash = hashlib.sha256(
+            json.dumps(classification, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        version = f"taxonomy={self.taxonomy.version};analyzer={DocumentAnalyzer.ANALYZER_VERSION}"
+        params = json.dumps([filename, classification_hash, use_openai], ensure_ascii=False)
+        return self._memoize('analyze', normalized.digest, version, params,
+                             lambda: DocumentAnalyzer.analyze(normalized, filename, classification,
+                                                              use_openai=use_openai))
+    
+    def process(self, content: TextLike, filename: str = "", page_offsets: Optional[array] = None,
+                use_openai: bool = False) -> Dict:
+        """
+        Chạy các bước chuẩn hóa, phân loại, metadata và phân tích trên văn bản đã đọc
+        
+        Returns:
+            Dict chứa normalized, classification, metadata, analysis
+        """
+        normalized = self.normalize(content)
+        classification = self.classify(normalized, filename, page_offsets)
+        return {
+            'normalized': normalized,
+            'classification': classification,
+            'metadata': self.metadata(normalized, filename),
+            'analysis': self.analyze(normalized, filename, classification, use_openai=use_openai)
+        }
+    
+    def run(self, source: DocumentSource, filename: Optional[str] = None, use_openai: bool = False) -> Dict:
+        """
+        Chạy toàn bộ các bước (trừ persist) trên một file
+        
+        Returns:
+            Dict của read() cộng thêm normalized, classification, metadata, analysis
+        """
+        if filename is None and isinstance(source, str):
+            filename = os.path.basename(source)
+        document = dict(self.read(source, filename))
+        document.update(self.process(document['text'], filename or "", document['page_offsets'],
+                                     use_openai=use_openai))
+        return document
+    
+    def persist(self, filename: str, file_data, file_type: str, category: str, content: TextLike,
+                classification: Dict, analysis: Dict, page_offsets: Optional[array] = None,
+                document_type: Optional[str] = None, issuing_agency: Optional[str] = None,
+                issue_date: Optional[str] = None, document_number: Optional[str] = None) -> int:
+        """
+        Bước lưu: ghi tài liệu và kết quả xử lý vào database
+        
+        Args:
+            filename: Tên file
+            file_data: Dữ liệu file
+            file_type: Loại file (pdf, docx, txt)
+            category: Thư mục nhóm được chọn (có thể khác kết quả phân loại)
+            content: Nội dung văn bản
+            classification: Kết quả bước phân loại
+            analysis: Kết quả bước phân tích
+            page_offsets: Bảng vị trí trang
+            document_type, issuing_agency, issue_date, document_number: Metadata (đã được
+                người dùng xác nhận)
+        
+        Returns:
+            ID của tài liệu vừa lưu
+        """
+        if self.db is None:
+            raise ValueError("DocumentPipeline không có database để lưu tài liệu")
+        normalized = self.normalize(content)
+        return self.db.save_document(
+            filename=filename,
+            file_data=file_data,
+            file_type=file_type,
+            category=category,
+            document_type=document_type,
+            issuing_agency=issuing_agency,
+            issue_date=issue_date,
+            document_number=document_number,
+            content_text=normalized.raw,
+            classification_result=classification,
+            analysis_result=analysis,
+            page_offsets=page_offsets,
+            keywords=DocumentClassifier.find_keywords(normalized, self.taxonomy)
+        )
+    
+    def clear(self):
+        """Xóa toàn bộ kết quả đã ghi nhớ"""
+        self._memo.clear()
+    
+    def _memoize(self, stage: str, content_hash: str, version, params: str, compute: Callable):
+        """Trả kết quả đã ghi nhớ của một bước, chưa có thì chạy compute() và ghi nhớ"""
+        key: Tuple = (stage, content_hash, version, params)
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            return self._memo[key]
+        
+        result = compute()
+        self._memo[key] = result
+        while len(self._memo) > self.max_entries:
+            self._memo.popitem(last=False)
+        return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Đọc, phân loại, trích xuất metadata và phân tích tài liệu")
+    parser.add_argument('files', nargs='+', help="Các file tài liệu (PDF, DOCX, TXT)")
+    parser.add_argument('--db', default="documents.db", help="File DocumentDB (mặc định: documents.db)")
+    parser.add_argument('--no-db', action='store_true',
+                        help="Không dùng database (không có trọng số IDF, không lưu được)")
+    parser.add_argument('--save', action='store_true',
+                        help="Lưu tài liệu vào database theo nhóm được phân loại tự động")
+    parser.add_argument('--openai', action='store_true', help="Dùng OpenAI để tạo tóm tắt")
+    args = parser.parse_args(argv)
+    
+    if args.save and args.no_db:
+        parser.error("--save cần database")
+    
+    from database import DocumentDB
+    db = None if args.no_db else DocumentDB(args.db)
+    pipeline = DocumentPipeline(db=db)
+    
+    failures = 0
+    for path in args.files:
+        try:
+            document = pipeline.run(path, use_openai=args.openai)
+        except Exception as e:
+            print(f"Lỗi khi xử lý {path}: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        
+        report = {
+            'file': path,
+            'file_type': document['file_type'],
+            'content_hash': document['content_hash'],
+            'classification': document['classification'],
+            'metadata': document['metadata'],
+            'analysis': document['analysis']
+        }
+        
+        if args.save:
+            with open(path, 'rb') as f:
+                file_data = f.read()
+            metadata = document['metadata']
+            report['document_id'] = pipeline.persist(
+                filename=os.path.basename(path),
+                file_data=file_data,
+                file_type=document['file_type'],
+                category=document['classification']['main_folder'],
+                content=document['normalized'],
+                classification=document['classification'],
+                analysis=document['analysis'],
+                page_offsets=document['page_offsets'],
+                document_type=metadata['document_type'],
+                issuing_agency=metadata['issuing_agency'],
+                # Ngày trích xuất được nhưng không hợp lệ (vd. 31/02) thì bỏ qua
+                issue_date=DocumentDB.parse_issue_date(metadata['issue_date'], strict=False),
+                document_number=metadata['document_number']
+            )
+        
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -66,6 +66,7 @@ class QASystem:
                             'id': doc['id'],
                             'filename': doc['filename'],
                             'content': full_doc['content_text'],
+                            'page_offsets': full_doc.get('page_offsets'),
                             'category': doc['category'],
                             'document_type': doc.get('document_type'),
                             'issuing_agency': doc.get('issuing_agency'),
@@ -105,14 +106,20 @@ class QASystem:
             matches = sum(1 for keyword in question_keywords if keyword in content_lower)
             
             if matches > 0:
-                # Tìm đoạn văn bản chứa từ khóa
+                # Tìm đoạn văn bản chứa từ khóa (kèm số trang nếu có bảng vị trí trang)
                 paragraphs = doc['content'].split('\n')
+                page_offsets = doc.get('page_offsets')
                 relevant_paragraphs = []
+                relevant_pages = []
+                position = 0
                 
                 for para in paragraphs:
                     para_lower = para.lower()
                     if any(keyword in para_lower for keyword in question_keywords) and len(para.strip()) > 20:
                         relevant_paragraphs.append(para.strip())
+                        if page_offsets:
+                            relevant_pages.append(DocumentReader.page_of(page_offsets, position))
+                    position += len(para) + 1
                 
                 if relevant_paragraphs:
                     result_item = {
@@ -120,6 +127,7 @@ class QASystem:
                         'id': doc.get('id'),
                         'category': doc.get('category'),
                         'relevant_text': relevant_paragraphs[:3],  # Lấy 3 đoạn đầu tiên
+                        'relevant_pages': relevant_pages[:3],
                         'match_score': matches,
                         'full_content': doc['content']  # Thêm full content để dùng với OpenAI
                     }
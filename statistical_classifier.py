@@ -0,0 +1,202 @@
+"""
+Module phân loại thống kê (Naive Bayes trên n-gram từ đã băm), học dần từ các tài liệu đã lưu
+"""
+
+import os
+import json
+import zlib
+import tempfile
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from normalizer import NormalizedText, TextLike
+from tokenizer import tokenize
+from config import (
+    STAT_N_FEATURES, STAT_NGRAM, STAT_ALPHA, STAT_MAX_TOKENS,
+    STAT_MIN_DOCUMENTS, STAT_OVERRIDE_WEIGHT, STAT_MODEL_PATH
+)
+
+
+class StatisticalClassifier:
+    """
+    Multinomial Naive Bayes trên n-gram từ được băm vào STAT_N_FEATURES chiều
+    
+    Mô hình chỉ gồm vài mảng NumPy (số tài liệu và tổng trọng số đặc trưng
+    theo từng nhóm) nên học thêm một tài liệu là một phép cộng vào hàng của
+    nhóm đó, dự đoán là một phép gather trên các đặc trưng của tài liệu.
+    Nhãn là thư mục (category) cuối cùng của tài liệu khi lưu vào DocumentDB;
+    các tài liệu mà người dùng đã đổi nhóm so với kết quả tự động được học
+    với trọng số STAT_OVERRIDE_WEIGHT.
+    """
+    
+    def __init__(self, n_features: int = STAT_N_FEATURES, alpha: float = STAT_ALPHA):
+        """
+        Khởi tạo mô hình rỗng
+        
+        Args:
+            n_features: Số chiều không gian đặc trưng sau khi băm
+            alpha: Hệ số làm trơn Laplace
+        """
+        self.n_features = n_features
+        self.alpha = alpha
+        self.labels: List[str] = []
+        self.doc_counts = np.zeros(0, dtype=np.float64)
+        self.class_totals = np.zeros(0, dtype=np.float64)
+        self.feature_counts = np.zeros((0, n_features), dtype=np.float32)
+        # id lớn nhất của DocumentDB đã được học (học tiếp từ id sau)
+        self.last_trained_id = 0
+    
+    @property
+    def is_ready(self) -> bool:
+        """Đã học đủ tài liệu (và ít nhất 2 nhóm) để dự đoán"""
+        return len(self.labels) >= 2 and self.doc_counts.sum() >= STAT_MIN_DOCUMENTS
+    
+    def featurize(self, content: TextLike) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Chuyển văn bản thành vector đặc trưng thưa
+        
+        Token là các từ (tokenizer.tokenize) của NormalizedText.lower (tối đa STAT_MAX_TOKENS từ đầu),
+        đặc trưng là unigram đến STAT_NGRAM-gram được băm bằng CRC32. Trọng số
+        log(1 + số lần xuất hiện) để tài liệu dài không lấn át.
+        
+        Returns:
+            tuple: (chỉ số đặc trưng không trùng, trọng số tương ứng)
+        """
+        tokens = tokenize(NormalizedText.of(content).lower)[:STAT_MAX_TOKENS]
+        grams = Counter(tokens)
+        for n in range(2, STAT_NGRAM + 1):
+            grams.update(map(' '.join, zip(*(tokens[i:] for i in range(n)))))
+        if not grams:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        
+        hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams),
+                             dtype=np.int64, count=len(grams)) % self.n_features
+        counts = np.fromiter(grams.values(), dtype=np.float64, count=len(grams))
+        # Gộp các n-gram bị băm trùng chỉ số
+        indices, inverse = np.unique(hashes, return_inverse=True)
+        values = np.bincount(inverse, weights=counts)
+        return indices, np.log1p(values)
+    
+    def partial_fit(self, content: TextLike, label: str, weight: float = 1.0):
+        """
+        Học thêm một tài liệu
+        
+        Args:
+            content: Nội dung văn bản
+            label: Nhóm (thư mục) đúng của tài liệu
+            weight: Trọng số của tài liệu
+        """
+        indices, values = self.featurize(content)
+        row = self._label_index(label)
+        self.feature_counts[row, indices] += (values * weight).astype(np.float32)
+        self.class_totals[row] += values.sum() * weight
+        self.doc_counts[row] += weight
+    
+    def predict_proba(self, content: TextLike) -> Dict[str, float]:
+        """
+        Xác suất của từng nhóm
+        
+        Returns:
+            Dict {nhóm (thư mục): xác suất}, rỗng nếu mô hình chưa học
+        """
+        if not self.labels:
+            return {}
+        indices, values = self.featurize(content)
+        
+        log_prior = np.log(self.doc_counts + self.alpha) - np.log(self.doc_counts.sum() + self.alpha * len(self.labels))
+        log_likelihood = (
+            np.log(self.feature_counts[:, indices] + self.alpha) @ values
+            - values.sum() * np.log(self.class_totals + self.alpha * self.n_features)
+        )
+        joint = log_prior + log_likelihood
+        probabilities = np.exp(joint - joint.max())
+        probabilities /= probabilities.sum()
+        return dict(zip(self.labels, probabilities.tolist()))
+    
+    def train_from_db(self, db, batch_size: int = 100) -> int:
+        """
+        Học các tài liệu mới trong DocumentDB (id > last_trained_id)
+        
+        Args:
+            db: DocumentDB
+            batch_size: Số tài liệu đọc mỗi lần
+        
+        Returns:
+            Số tài liệu đã học thêm
+        """
+        trained = 0
+        while True:
+            documents = db.get_documents_after(self.last_trained_id, batch_size)
+            if not documents:
+                return trained
+            for document in documents:
+                if document['content_text']:
+                    self.partial_fit(document['content_text'], document['category'],
+                                     self._document_weight(document))
+                    trained += 1
+                self.last_trained_id = document['id']
+    
+    def save(self, path: str = STAT_MODEL_PATH):
+        """Lưu mô hình ra file .npz (ghi file tạm rồi thay thế)"""
+        # Mỗi lần lưu dùng file tạm riêng: nhiều phiên lưu cùng lúc không ghi đè file tạm của nhau
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(dir=directory, prefix=f"{os.path.basename(path)}.",
+                                         suffix='.tmp', delete=False) as f:
+            temp_path = f.name
+        try:
+            with open(temp_path, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    labels=np.array(self.labels, dtype=str),
+                    doc_counts=self.doc_counts,
+                    class_totals=self.class_totals,
+                    feature_counts=self.feature_counts,
+                    params=np.array([self.n_features, self.alpha, self.last_trained_id], dtype=np.float64)
+                )
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    
+    @staticmethod
+    def load(path: str = STAT_MODEL_PATH) -> 'StatisticalClassifier':
+        """
+        Đọc mô hình đã lưu (mô hình rỗng nếu chưa có file)
+        
+        Args:
+            path: Đường dẫn file .npz
+        """
+        if not os.path.exists(path):
+            return StatisticalClassifier()
+        
+        with np.load(path) as data:
+            n_features, alpha, last_trained_id = data['params'].tolist()
+            model = StatisticalClassifier(int(n_features), alpha)
+            model.labels = data['labels'].tolist()
+            model.doc_counts = data['doc_counts']
+            model.class_totals = data['class_totals']
+            model.feature_counts = data['feature_counts']
+            model.last_trained_id = int(last_trained_id)
+        return model
+    
+    def _label_index(self, label: str) -> int:
+        """Chỉ số hàng của nhóm, thêm hàng mới nếu nhóm chưa có"""
+        if label not in self.labels:
+            self.labels.append(label)
+            self.doc_counts = np.append(self.doc_counts, 0.0)
+            self.class_totals = np.append(self.class_totals, 0.0)
+            self.feature_counts = np.vstack([self.feature_counts,
+                                             np.zeros((1, self.n_features), dtype=np.float32)])
+        return self.labels.index(label)
+    
+    @staticmethod
+    def _document_weight(document: Dict) -> float:
+        """Trọng số học: tài liệu bị người dùng đổi nhóm so với phân loại tự động được học mạnh hơn"""
+        try:
+            classification = json.loads(document.get('classification_result') or '{}')
+        except ValueError:
+            return 1.0
+        auto_folder: Optional[str] = classification.get('main_folder')
+        if auto_folder and auto_folder != document['category']:
+            return STAT_OVERRIDE_WEIGHT
+        return 1.0
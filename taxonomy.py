@@ -0,0 +1,152 @@
+"""
+Module quản lý bộ phân loại (nhóm, thư mục, tên hiển thị, từ khóa) đọc từ file cấu hình
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Tuple
+from keyword_matcher import KeywordMatcher
+from normalizer import NormalizedText
+from tokenizer import TokenVocabulary, tokenize
+from config import TAXONOMY_PATH, TAXONOMY_RELOAD_INTERVAL
+
+
+class Taxonomy:
+    """
+    Bộ phân loại đã biên dịch (chỉ đọc)
+    
+    Gồm các nhóm theo thứ tự khai báo, mapping nhóm -> thư mục -> tên hiển thị
+    và automaton từ khóa (theo token) dựng sẵn. Mỗi phiên bản là một object riêng nên
+    người đang dùng phiên bản cũ không bị ảnh hưởng khi store nạp phiên bản mới.
+    """
+    
+    def __init__(self, data: Dict):
+        """
+        Biên dịch bộ phân loại
+        
+        Args:
+            data: Nội dung taxonomy.json (version, groups, fallback)
+        """
+        self.version = data['version']
+        self.groups = [group['key'] for group in data['groups']]
+        self.keywords: Dict[str, List[str]] = {group['key']: list(group['keywords'])
+                                               for group in data['groups']}
+        self.folder_mapping: Dict[str, str] = {group['key']: group['folder']
+                                               for group in data['groups']}
+        
+        fallback = data['fallback']
+        self.fallback_group = fallback['key']
+        self.fallback_folder = fallback['folder']
+        
+        # Tên hiển thị theo nhóm và theo thư mục (gồm cả nhóm "Khác")
+        self.group_names: Dict[str, str] = {group['key']: group['name'] for group in data['groups']}
+        self.group_names[self.fallback_group] = fallback['name']
+        self.folder_names: Dict[str, str] = {group['folder']: group['name'] for group in data['groups']}
+        self.folder_names[self.fallback_folder] = fallback['name']
+        
+        # Từ khóa được chuẩn hóa như văn bản (NormalizedText.lower) rồi tách token;
+        # automaton chạy trên dãy mã token nên "fs" không khớp bên trong "offset"
+        self.vocabulary = TokenVocabulary()
+        self.keyword_keys: Dict[str, Tuple[int, ...]] = {
+            keyword: tuple(self.vocabulary.add(token) for token in tokenize(NormalizedText(keyword).lower))
+            for keywords in self.keywords.values()
+            for keyword in keywords
+        }
+        self.matcher = KeywordMatcher(list(dict.fromkeys(self.keyword_keys.values())))
+    
+    def folders(self) -> List[str]:
+        """Danh sách thư mục theo thứ tự hiển thị (nhóm "Khác" ở cuối)"""
+        return list(self.folder_names)
+    
+    def group_name(self, group: str) -> str:
+        """Tên hiển thị của nhóm (mặc định là tên nhóm "Khác")"""
+        return self.group_names.get(group, self.group_names[self.fallback_group])
+    
+    def folder_name(self, folder: str) -> str:
+        """Tên hiển thị của thư mục (giữ nguyên nếu không có trong bộ phân loại)"""
+        return self.folder_names.get(folder, folder)
+
+
+class TaxonomyStore:
+    """
+    Nạp bộ phân loại từ file JSON và tự nạp lại khi trường version thay đổi
+    
+    File được kiểm tra lại tối đa mỗi reload_interval giây. Phiên bản mới được
+    biên dịch xong rồi mới thay thế phiên bản đang dùng; trong lúc biên dịch
+    (hoặc khi file mới bị lỗi) các lời gọi get() vẫn nhận phiên bản cũ.
+    """
+    
+    _default = None
+    
+    def __init__(self, path: str = TAXONOMY_PATH, reload_interval: float = TAXONOMY_RELOAD_INTERVAL):
+        """
+        Khởi tạo store và nạp bộ phân loại lần đầu
+        
+        Args:
+            path: Đường dẫn đến file taxonomy.json
+            reload_interval: Khoảng thời gian tối thiểu giữa hai lần kiểm tra file (giây)
+        """
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(path)
+        self._checked_at = time.monotonic()
+        self._current = Taxonomy(self._load())
+    
+    @staticmethod
+    def default() -> 'TaxonomyStore':
+        """Lấy store dùng chung của ứng dụng (đọc config.TAXONOMY_PATH)"""
+        if TaxonomyStore._default is None:
+            TaxonomyStore._default = TaxonomyStore()
+        return TaxonomyStore._default
+    
+    def get(self) -> Taxonomy:
+        """Lấy bộ phân loại hiện tại (nạp lại nếu file đã đổi version)"""
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self._current
+    
+    def reload(self, force: bool = False) -> bool:
+        """
+        Kiểm tra file và nạp phiên bản mới nếu version thay đổi
+        
+        Args:
+            force: Đọc lại file kể cả khi thời điểm sửa đổi không đổi
+        
+        Returns:
+            bool: True nếu đã chuyển sang phiên bản mới
+        """
+        # Chỉ một thread biên dịch, các thread khác tiếp tục dùng phiên bản hiện tại
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime == self._mtime and not force:
+                    return False
+                data = self._load()
+                if data['version'] == self._current.version:
+                    self._mtime = mtime
+                    return False
+                taxonomy = Taxonomy(data)
+            except (OSError, ValueError, KeyError, TypeError):
+                # File đang được ghi dở hoặc sai cấu trúc: giữ phiên bản cũ, thử lại lần sau
+                return False
+            self._mtime = mtime
+            self._current = taxonomy
+            return True
+        finally:
+            self._lock.release()
+    
+    def _load(self) -> Dict:
+        """Đọc nội dung file taxonomy"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def get_taxonomy() -> Taxonomy:
+    """Lấy bộ phân loại hiện tại của store dùng chung"""
+    return TaxonomyStore.default().get()
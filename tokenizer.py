@@ -0,0 +1,64 @@
+"""
+Module tách từ (token) dùng chung cho các bước so khớp và thống kê
+"""
+
+import re
+from itertools import repeat
+from typing import Dict, Iterable, List
+
+
+# Token là dãy chữ/số liên tiếp; dấu câu, khoảng trắng và "_" (hay dùng trong tên file) là ranh giới
+_TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tách văn bản thành các token
+    
+    Văn bản nên được chuẩn hóa trước (NormalizedText.lower) để "Nhà ở" và
+    "nhà ở" cho cùng token.
+    """
+    # Phần lớn từ tách theo khoảng trắng đã là token trọn vẹn; regex (chậm hơn
+    # str.split nhiều lần trên văn bản Unicode) chỉ chạy cho từ dính dấu câu
+    tokens = []
+    append = tokens.append
+    extend = tokens.extend
+    findall = _TOKEN_PATTERN.findall
+    for word in text.split():
+        if word.isalnum():
+            append(word)
+        else:
+            extend(findall(word))
+    return tokens
+
+
+class TokenVocabulary:
+    """
+    Bảng mã token -> số nguyên
+    
+    Chỉ các token của từ khóa được đăng ký; mọi token khác được mã thành
+    UNKNOWN, đóng vai trò ranh giới nên cụm từ khóa chỉ khớp khi các token
+    của nó đứng liền nhau trong văn bản.
+    """
+    
+    UNKNOWN = 0
+    
+    def __init__(self, tokens: Iterable[str] = ()):
+        self.ids: Dict[str, int] = {}
+        for token in tokens:
+            self.add(token)
+    
+    def add(self, token: str) -> int:
+        """Đăng ký token, trả về mã của nó"""
+        token_id = self.ids.get(token)
+        if token_id is None:
+            token_id = self.ids[token] = len(self.ids) + 1
+        return token_id
+    
+    def encode_tokens(self, tokens: List[str]) -> List[int]:
+        """Mã hóa danh sách token (token chưa đăng ký -> UNKNOWN)"""
+        return list(map(self.ids.get, tokens, repeat(TokenVocabulary.UNKNOWN, len(tokens))))
+    
+    def encode(self, text: str) -> List[int]:
+        """Tách và mã hóa văn bản"""
+        return self.encode_tokens(tokenize(text))